@@ -5,34 +5,52 @@ import re
 import sys
 from pathlib import Path
 
+# Separator lines made only of dashes/equals (starting with a dash)
+_SEP_RE = re.compile(rb'-[-=]*')
+# Characters that disqualify a line from being a filename
+_FORBIDDEN = b'=-'
+
+# Section markers of the analysis report
+_REJECTED_HEADER = b"Files Rejected by AI:"
+_SECTION_ENDS = (b"Mapping Outcomes Summary:", b"Files with Too Few Mappings")
+_REASON_PREFIX = b"Reason:"
+
+# Section transitions keyed by a short line prefix, so most lines cost one
+# dict lookup: prefix -> (marker, exact match required, entering section)
+_HEADER_PREFIX_LEN = 16
+_HEADERS = {_REJECTED_HEADER[:_HEADER_PREFIX_LEN]: (_REJECTED_HEADER, True, True)}
+for _marker in _SECTION_ENDS:
+    _HEADERS[_marker[:_HEADER_PREFIX_LEN]] = (_marker, False, False)
+
 def extract_rejected_files(analysis_file):
     """Extract filenames of files rejected by AI from the analysis file."""
     rejected_files = []
     in_rejected_section = False
     
-    with open(analysis_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
+    # Read the whole file as one bytes blob and split it in a single C call;
+    # only the matched filenames are decoded
+    data = Path(analysis_file).read_bytes()
+    for line in data.split(b'\n'):
+        line = line.strip()
+        
+        # Skip separator lines
+        if _SEP_RE.fullmatch(line):
+            continue
             
-            # Skip separator lines
-            if line.startswith('-') and all(c in '-=' for c in line):
-                continue
-                
-            # Check for section header
-            if line == "Files Rejected by AI:":
-                in_rejected_section = True
+        # Check for section header
+        header = _HEADERS.get(line[:_HEADER_PREFIX_LEN])
+        if header is not None:
+            marker, exact, entering = header
+            if line == marker if exact else line.startswith(marker):
+                in_rejected_section = entering
                 continue
-            elif line.startswith("Mapping Outcomes Summary:") or line.startswith("Files with Too Few Mappings"):
-                in_rejected_section = False
-                continue
-            
-            # If we're in the rejected section and the line starts with a filename
-            if in_rejected_section and line and not line.startswith("Reason:"):
-                # Only add if it looks like a filename (contains a dot and no special characters)
-                if '.' in line and not any(c in '=-' for c in line):
-                    filename = line.strip()
-                    if filename:
-                        rejected_files.append(filename)
+        
+        # If we're in the rejected section and the line starts with a filename
+        if in_rejected_section and line and not line.startswith(_REASON_PREFIX):
+            # Only add if it looks like a filename (contains a dot and no special characters)
+            # (translate deletes nothing iff no forbidden character is present)
+            if b'.' in line and line.translate(None, _FORBIDDEN) == line:
+                rejected_files.append(line.decode('utf-8'))
     
     return rejected_files
 
@@ -40,25 +58,43 @@ def delete_files(filenames, base_dir):
     """Delete the specified files if they exist in the base directory."""
     deleted = []
     not_found = []
+    log = []
     
-    # Ensure base_dir exists and is a directory
-    if not os.path.isdir(base_dir):
+    # Open base_dir once and unlink relative to it, so each path is not
+    # re-resolved from the root; fall back to joined paths where unsupported.
+    # Opening the directory also checks that it exists and is a directory.
+    dir_fd = None
+    try:
+        if os.unlink in os.supports_dir_fd:
+            dir_fd = os.open(base_dir, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+        elif not os.path.isdir(base_dir):
+            raise NotADirectoryError(base_dir)
+    except OSError:
         print(f"Error: Base directory '{base_dir}' does not exist or is not a directory")
         return deleted, not_found
     
-    for filename in filenames:
-        try:
-            # Construct full path by joining base_dir and filename
-            full_path = os.path.join(base_dir, filename)
-            if os.path.exists(full_path):
-                os.remove(full_path)
+    try:
+        for filename in filenames:
+            try:
+                # A missing file is reported by the unlink itself, no stat first
+                if dir_fd is not None:
+                    os.unlink(filename, dir_fd=dir_fd)
+                else:
+                    os.remove(os.path.join(base_dir, filename))
                 deleted.append(filename)
-                print(f"Deleted: {filename}")
-            else:
+                log.append(f"Deleted: {filename}")
+            except FileNotFoundError:
                 not_found.append(filename)
-                print(f"File not found: {filename}")
-        except Exception as e:
-            print(f"Error deleting {filename}: {str(e)}")
+                log.append(f"File not found: {filename}")
+            except OSError as e:
+                log.append(f"Error deleting {filename}: {str(e)}")
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+    
+    # Report per-file results in a single write
+    if log:
+        sys.stdout.write("\n".join(log) + "\n")
     
     return deleted, not_found
 
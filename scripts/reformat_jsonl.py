@@ -5,102 +5,549 @@ Processes files line by line to handle large files efficiently.
 """
 
 import json
+import mmap
+import multiprocessing
 import os
 import argparse
+import queue
+import re
+import shutil
+import tempfile
+import threading
 import time
 from pathlib import Path
 from tqdm import tqdm
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
 
-def count_lines(filename):
-    """Efficiently count lines in a file without loading it all into memory"""
-    with open(filename, 'rb') as f:
-        lines = 0
-        buf_size = 1024 * 1024
-        read_f = f.raw.read
+try:
+    import simdjson
+except ImportError:  # simdjson is optional; used for the parsing fallback only
+    simdjson = None
 
-        buf = read_f(buf_size)
-        while buf:
-            lines += buf.count(b'\n')
-            buf = read_f(buf_size)
 
-    return lines
+if orjson is not None:
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+else:
+    _loads = json.loads
 
-def process_jsonl_file(input_file, output_file):
+    def _dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+
+
+def _extract_inner_json(line):
+    """
+    Parse a line with the stdlib json module and return its inner value as JSON bytes.
+    
+    Used when the faster parser cannot represent the line exactly, e.g.
+    integers wider than 64 bits or NaN/Infinity, which the stdlib keeps.
+    """
+    data = json.loads(line)
+    if isinstance(data, dict) and len(data) == 1:
+        for value in data.values():
+            return json.dumps(value).encode('utf-8')
+    return None
+
+
+if simdjson is not None:
+    # One parser per process, reused so its buffers stay allocated across lines
+    _parser = simdjson.Parser()
+
+    def extract_inner(line):
+        """
+        Fully parse a line and return its single inner value as JSON bytes.
+        
+        Raises ValueError if the line is not valid JSON; returns None if it is
+        not an object with exactly one key.
+        """
+        try:
+            doc = _parser.parse(line)
+        except (RuntimeError, ValueError):
+            # simdjson rejects some JSON the stdlib accepts: NaN/Infinity
+            # (ValueError) and integers wider than 64 bits (RuntimeError)
+            return _extract_inner_json(line)
+        if not isinstance(doc, simdjson.Object) or len(doc) != 1:
+            return None
+        for key in doc.keys():
+            value = doc[key]
+            # Containers are re-emitted straight from the parsed tape
+            if isinstance(value, (simdjson.Object, simdjson.Array)):
+                return value.mini
+            return _dumps(value)
+
+    def validate_json(data):
+        """Raise ValueError unless data holds exactly one valid JSON value"""
+        try:
+            _parser.parse(data)
+        except (RuntimeError, ValueError):
+            # Valid JSON simdjson rejects (e.g. NaN or wide integers)
+            json.loads(data)
+else:
+    # Integers wider than 64 bits have at least 20 digits; orjson either
+    # rejects them or silently turns them into floats, so such lines go
+    # straight to the stdlib parser
+    _WIDE_INT_RE = re.compile(rb'\d{20}')
+
+    def extract_inner(line):
+        """
+        Fully parse a line and return its single inner value as JSON bytes.
+        
+        Raises ValueError if the line is not valid JSON; returns None if it is
+        not an object with exactly one key.
+        """
+        if _WIDE_INT_RE.search(line) is not None:
+            return _extract_inner_json(line)
+        try:
+            data = _loads(line)
+        except ValueError:
+            # orjson rejects some JSON the stdlib accepts (NaN, Infinity, ...)
+            return _extract_inner_json(line)
+        if isinstance(data, dict) and len(data) == 1:
+            for value in data.values():
+                return _dumps(value)
+        return None
+
+    def validate_json(data):
+        """Raise ValueError unless data holds exactly one valid JSON value"""
+        try:
+            _loads(data)
+        except ValueError:
+            # Valid JSON orjson rejects (e.g. NaN or wide integers)
+            json.loads(data)
+
+# Output is accumulated in user space and flushed with os.writev at this size
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+# Number of full buffers that may be queued for the background writer
+WRITE_QUEUE_DEPTH = 4
+# Most segments a single os.writev call accepts
+try:
+    IOV_MAX = max(os.sysconf('SC_IOV_MAX'), 16)
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
+# The kernel is asked to page in this much of the input ahead of the scan
+READAHEAD_SIZE = 16 * 1024 * 1024
+# Files are split into chunks of about this size for parallel processing
+PARALLEL_CHUNK_SIZE = 64 * 1024 * 1024
+# Only the first few malformed lines are reported individually
+MAX_REPORTED_ERRORS = 10
+# Input is transformed in line-aligned blocks of about this size
+TRANSFORM_BLOCK_SIZE = 1024 * 1024
+
+# Matches a whole {"key": value} line and captures the value, with the same
+# structural rules as strip_outer_key; used to strip a full block in C
+_OUTER_KEY_RE = re.compile(
+    rb'^[^\S\n]*\{[^\S\n]*"[^"\\\n]*(?:\\.[^"\\\n]*)*"[^\S\n]*:[^\S\n]*(.*\S)[^\S\n]*\}[^\S\n]*$',
+    re.MULTILINE,
+)
+
+
+def iter_blocks(mm, start=0, end=None):
+    """
+    Yield consecutive blocks of a memory-mapped file range as bytes.
+    
+    Each block holds about TRANSFORM_BLOCK_SIZE bytes of whole lines. While
+    one READAHEAD_SIZE window is being scanned, the next one is advised with
+    MADV_WILLNEED so the kernel reads it in parallel with the parsing.
+    """
+    size = len(mm) if end is None else end
+    find = mm.find
+    advise = None
+    if isinstance(mm, mmap.mmap) and hasattr(mmap, 'MADV_WILLNEED'):
+        advise = mm.madvise
+    ahead = start - start % mmap.PAGESIZE  # madvise needs a page-aligned start
+    pos = start
+    while pos < size:
+        if advise is not None and pos >= ahead - READAHEAD_SIZE:
+            if ahead < size:
+                advise(mmap.MADV_WILLNEED, ahead, min(READAHEAD_SIZE, size - ahead))
+            ahead += READAHEAD_SIZE
+        nl = find(b'\n', min(pos + TRANSFORM_BLOCK_SIZE, size) - 1, size)
+        nl = size if nl < 0 else nl + 1
+        yield mm[pos:nl]
+        pos = nl
+
+def write_all(fd, data):
+    """Write all of data to a raw file descriptor, retrying short writes"""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+def write_segments(fd, segments):
+    """
+    Write a list of byte buffers to a raw file descriptor with os.writev.
+
+    The kernel gathers the segments, so they never have to be copied into one
+    contiguous buffer. At most IOV_MAX segments go out per call and short
+    writes are retried from where they stopped.
+    """
+    i = 0
+    while i < len(segments):
+        batch = segments[i:i + IOV_MAX]
+        written = os.writev(fd, batch)
+        for seg in batch:
+            if written < len(seg):
+                # Short write: finish this segment, resume with the next one
+                write_all(fd, memoryview(seg)[written:])
+                i += 1
+                break
+            written -= len(seg)
+            i += 1
+
+class BackgroundWriter:
+    """
+    Flush full output buffers to a file descriptor from a background thread.
+
+    os.writev releases the GIL, so writing one batch of segments overlaps
+    with filling the next. The pending queue is bounded so memory stays flat.
+    """
+
+    def __init__(self, fd, depth=WRITE_QUEUE_DEPTH):
+        self.fd = fd
+        self.error = None
+        self._pending = queue.Queue(maxsize=depth)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            segments = self._pending.get()
+            if segments is None:
+                break
+            # Keep draining after a failure so submit() never blocks forever
+            if self.error is None:
+                try:
+                    write_segments(self.fd, segments)
+                except OSError as e:
+                    self.error = e
+
+    def submit(self, segments):
+        """
+        Queue a list of buffers for writing.
+
+        Args:
+            segments (list): Buffers to write in order; neither the list nor
+                the buffers may be touched afterwards
+        """
+        if self.error is not None:
+            raise self.error
+        self._pending.put(segments)
+
+    def close(self):
+        """Wait for all queued buffers to be written"""
+        self._pending.put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+def strip_outer_key(line):
+    """
+    Slice the inner value out of a ``{"key": value}`` line without parsing it.
+
+    Only the wrapper is checked structurally; a line holding more than one
+    top-level key is not detected here (use --strict for full validation).
+
+    Args:
+        line (bytes): Raw input line
+
+    Returns:
+        bytes: The inner JSON value, or None if the line does not look like
+        a single-key wrapper
+    """
+    lb = line.strip()
+    if lb[:1] != b'{' or lb[-1:] != b'}':
+        return None
+
+    # Opening quote of the key, only whitespace allowed before it
+    key_start = lb.find(b'"', 1)
+    if key_start < 0 or lb[1:key_start].strip():
+        return None
+
+    # Closing quote of the key, skipping escaped quotes
+    key_end = key_start
+    while True:
+        key_end = lb.find(b'"', key_end + 1)
+        if key_end < 0:
+            return None
+        backslash = key_end - 1
+        while lb[backslash] == 0x5C:  # '\\'
+            backslash -= 1
+        if (key_end - 1 - backslash) % 2 == 0:
+            break
+
+    colon = lb.find(b':', key_end + 1)
+    if colon < 0 or lb[key_end + 1:colon].strip():
+        return None
+
+    inner = lb[colon + 1:-1].strip()
+    return inner or None
+
+def reformat_range(mm, start, end, out_fd, strict=False, progress=None):
+    """
+    Reformat the lines in mm[start:end] and write them to out_fd.
+    
+    Args:
+        mm (mmap.mmap): Mapped input file
+        start (int): Offset of the first byte of the range (a line start)
+        end (int): Offset just past the last byte of the range
+        out_fd (int): File descriptor the reformatted lines are written to
+        strict (bool): Parse and validate every line
+        progress (callable): Optional callback invoked with the bytes consumed,
+            once per block
+    
+    Returns:
+        tuple: (lines processed, lines taken by the byte-slice fast path,
+        error count, list of (line number, kind) for the first
+        MAX_REPORTED_ERRORS errors, numbered from the range start)
+    """
+    lines = 0
+    fast_lines = 0
+    errors = 0
+    error_samples = []
+    # Output is gathered as a list of segments for os.writev: whole joined
+    # blocks go in as-is, per-line output is collected in a bytearray first
+    segments = []
+    pending = 0
+    buf = bytearray()
+    writer = BackgroundWriter(out_fd)
+    
+    # Bind everything the loop calls to locals to skip per-line global lookups
+    strip = strip_outer_key
+    validate = validate_json if strict else None
+    strip_block = None if strict else _OUTER_KEY_RE.findall
+    extract = extract_inner
+    submit = writer.submit
+    buffer_limit = WRITE_BUFFER_SIZE
+    try:
+        for block in iter_blocks(mm, start, end):
+            block_lines = block.count(b'\n')
+            if not block.endswith(b'\n'):
+                block_lines += 1
+            
+            # Fastest path: when every line of the block is a plain wrapper,
+            # one regex scan extracts all inner values without a Python loop
+            if strip_block is not None:
+                inners = strip_block(block)
+                if len(inners) == block_lines:
+                    inners.append(b'')
+                    joined = b'\n'.join(inners)
+                    segments.append(joined)
+                    pending += len(joined)
+                    lines += block_lines
+                    fast_lines += block_lines
+                    if pending >= buffer_limit:
+                        submit(segments)
+                        segments = []
+                        pending = 0
+                    if progress is not None:
+                        progress(len(block))
+                    continue
+            
+            block_split = block.split(b'\n')
+            if block.endswith(b'\n'):
+                block_split.pop()
+            for line in block_split:
+                lines += 1
+                # Fast path: copy the inner bytes straight through
+                inner = strip(line)
+                if inner is not None and validate is not None:
+                    # Strict: the sliced value must parse on its own, which
+                    # also rejects lines with more than one top-level key
+                    try:
+                        validate(inner)
+                    except ValueError:
+                        inner = None
+                if inner is not None:
+                    fast_lines += 1
+                else:
+                    try:
+                        # Parse the line and extract the inner object
+                        inner = extract(line)
+                        if inner is None:
+                            # If structure is different, log and count errors
+                            errors += 1
+                            if errors <= MAX_REPORTED_ERRORS:
+                                error_samples.append((lines, 'unexpected structure'))
+                    except ValueError:
+                        errors += 1
+                        if errors <= MAX_REPORTED_ERRORS:
+                            error_samples.append((lines, 'failed to parse JSON'))
+                
+                # Write only the inner object to the output
+                if inner is not None:
+                    buf += inner
+                    buf += b'\n'
+            
+            if buf:
+                segments.append(buf)
+                pending += len(buf)
+                buf = bytearray()
+            if pending >= buffer_limit:
+                submit(segments)
+                segments = []
+                pending = 0
+            if progress is not None:
+                progress(len(block))
+        
+        if segments:
+            submit(segments)
+    finally:
+        writer.close()
+    
+    return lines, fast_lines, errors, error_samples
+
+def open_mmap(f):
+    """Map an open binary file read-only for a sequential scan"""
+    if os.fstat(f.fileno()).st_size == 0:
+        return b''  # a zero-length file cannot be mapped
+    if hasattr(os, 'posix_fadvise'):
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+    return mm
+
+def split_ranges(mm, chunk_size):
+    """Split a mapped file into (start, end) ranges aligned to line boundaries"""
+    size = len(mm)
+    ranges = []
+    start = 0
+    while start < size:
+        end = mm.find(b'\n', min(start + chunk_size, size) - 1)
+        end = size if end < 0 else end + 1
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+def reformat_chunk(task):
+    """Pool worker: reformat one byte range of the input into a part file"""
+    input_file, start, end, part_file, strict = task
+    out_fd = os.open(part_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        with open(input_file, 'rb') as f_in:
+            mm = open_mmap(f_in)
+            try:
+                return reformat_range(mm, start, end, out_fd, strict)
+            finally:
+                mm.close()
+    finally:
+        os.close(out_fd)
+
+def append_file(out_fd, path):
+    """Append the contents of path to out_fd, in the kernel where possible"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        offset = 0
+        try:
+            while offset < size:
+                sent = os.sendfile(out_fd, f.fileno(), offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+        except (AttributeError, OSError):
+            # sendfile to a regular file is Linux-only; copy the rest instead
+            f.seek(offset)
+            chunk = f.read(WRITE_BUFFER_SIZE)
+            while chunk:
+                write_all(out_fd, chunk)
+                chunk = f.read(WRITE_BUFFER_SIZE)
+
+def process_jsonl_file(input_file, output_file, strict=False, workers=1):
     """
     Process a JSONL file line by line, removing the outer key.
     
+    By default the inner value is sliced out of each line as raw bytes and
+    only lines that fail the structural check are parsed. With ``strict``
+    each sliced value is also parsed on its own to validate it, without
+    building the wrapper object; the bytes written are the same.
+    
+    Files larger than PARALLEL_CHUNK_SIZE are split on line boundaries and
+    the chunks are reformatted by a pool of worker processes, each into its
+    own part file; the parts are then concatenated in order.
+    
     Args:
         input_file (str): Path to input JSONL file
         output_file (str): Path to output JSONL file
+        strict (bool): Parse and validate every line
+        workers (int): Number of worker processes for large files
     """
     start_time = time.time()
     file_size = os.path.getsize(input_file)
     
     print(f"Processing file: {input_file} ({file_size / (1024 * 1024 * 1024):.2f} GB)")
     
-    # Count total lines for tqdm (with a small sample if file is very large)
-    print("Estimating total lines...")
-    if file_size > 1 * 1024 * 1024 * 1024:  # If larger than 1GB, estimate lines
-        with open(input_file, 'r', encoding='utf-8') as f:
-            sample_lines = 1000
-            sample_size = 0
-            for i in range(sample_lines):
-                line = f.readline()
-                if not line:
-                    break
-                sample_size += len(line.encode('utf-8'))
-            avg_line_size = sample_size / sample_lines if sample_lines > 0 else 0
-            total_lines = int(file_size / avg_line_size) if avg_line_size > 0 else 0
-            print(f"Estimated {total_lines:,} lines based on sampling")
-    else:
-        total_lines = count_lines(input_file)
-        print(f"Counted {total_lines:,} lines in file")
-    
-    with open(input_file, 'r', encoding='utf-8') as f_in, \
-         open(output_file, 'w', encoding='utf-8') as f_out:
-        
-        # Create tqdm progress bar
-        pbar = tqdm(total=total_lines, unit='lines', desc=f"Processing {Path(input_file).name}")
-        errors = 0
-        
-        for line in f_in:
-            try:
-                # Parse the line as JSON
-                data = json.loads(line.strip())
-                
-                # Extract the inner object (first value in the dictionary)
-                if len(data) == 1:
-                    inner_object = next(iter(data.values()))
-                    # Write only the inner object to the output
-                    f_out.write(json.dumps(inner_object) + '\n')
-                else:
-                    # If structure is different, log and count errors
-                    errors += 1
-                    if errors <= 10:  # Only show the first 10 errors
-                        print(f"Warning: Unexpected structure. Skipping.")
-            except json.JSONDecodeError:
-                errors += 1
-                if errors <= 10:  # Only show the first 10 errors
-                    print(f"Error: Failed to parse JSON. Skipping.")
+    # Progress is tracked in bytes, so no separate pass is needed to count lines
+    pbar = tqdm(total=file_size, unit='B', unit_scale=True, mininterval=0.5,
+                desc=f"Processing {Path(input_file).name}")
+    lines = 0
+    fast_lines = 0
+    errors = 0
+    error_samples = []
+    
+    # Map the input so the OS pages it in on demand, and write through a raw
+    # fd with a user-space buffer; neither side goes through the text layer.
+    # Full buffers are written by a background thread while parsing continues.
+    out_fd = os.open(output_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        with open(input_file, 'rb') as f_in:
+            mm = open_mmap(f_in)
+            ranges = split_ranges(mm, PARALLEL_CHUNK_SIZE)
             
-            # Update progress bar
-            pbar.update(1)
+            if workers > 1 and len(ranges) > 1:
+                part_dir = tempfile.mkdtemp(prefix='.reformat-', dir=os.path.dirname(os.path.abspath(output_file)))
+                try:
+                    tasks = [(input_file, start, end, os.path.join(part_dir, f"{i:06d}.part"), strict)
+                             for i, (start, end) in enumerate(ranges)]
+                    with multiprocessing.Pool(min(workers, len(tasks))) as pool:
+                        # imap keeps chunk order, so parts can be appended as they arrive
+                        for task, result in zip(tasks, pool.imap(reformat_chunk, tasks)):
+                            append_file(out_fd, task[3])
+                            os.remove(task[3])
+                            # Chunk line numbers are relative; offset by the lines before it
+                            error_samples.extend((lines + lineno, kind) for lineno, kind in result[3])
+                            lines += result[0]
+                            fast_lines += result[1]
+                            errors += result[2]
+                            pbar.update(task[2] - task[1])
+                finally:
+                    shutil.rmtree(part_dir, ignore_errors=True)
+            else:
+                lines, fast_lines, errors, error_samples = reformat_range(mm, 0, len(mm), out_fd, strict, pbar.update)
+            
+            if file_size:
+                mm.close()
         
-        # Close progress bar
-        pbar.close()
+        # The output is not read back, so let the kernel drop its cached pages
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(out_fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(out_fd)
+    
+    # Close progress bar
+    pbar.close()
     
     total_time = time.time() - start_time
-    print(f"Completed processing in {total_time:.1f} seconds")
+    print(f"Completed processing {lines:,} lines in {total_time:.1f} seconds")
     print(f"Output written to {output_file}")
+    if lines:
+        print(f"Fast path handled {fast_lines:,} of {lines:,} lines ({fast_lines / lines:.1%})")
     if errors > 0:
-        print(f"Encountered {errors} errors during processing")
+        print(f"Encountered {errors} errors during processing (skipped lines):")
+        for lineno, kind in error_samples[:MAX_REPORTED_ERRORS]:
+            print(f"  Line {lineno}: {kind}")
+        if errors > MAX_REPORTED_ERRORS:
+            print(f"  ... and {errors - MAX_REPORTED_ERRORS} more")
 
 
 def main():
     parser = argparse.ArgumentParser(description='Reformat JSONL files by removing the outer key')
     parser.add_argument('input_files', nargs='+', help='Input JSONL file(s)')
     parser.add_argument('-o', '--output-dir', help='Output directory (default: same as input with _reformatted suffix)')
+    parser.add_argument('--strict', action='store_true', help='Fully parse and validate every line instead of slicing out the inner value')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help='Worker processes used for large files (default: number of CPUs)')
     args = parser.parse_args()
     
     total_start_time = time.time()
@@ -120,7 +567,7 @@ def main():
             output_file = input_path.with_stem(f"{input_path.stem}_reformatted")
         
         file_start_time = time.time()
-        process_jsonl_file(str(input_path), str(output_file))
+        process_jsonl_file(str(input_path), str(output_file), strict=args.strict, workers=args.workers)
         file_time = time.time() - file_start_time
         print(f"Processed {input_path.name} in {file_time:.1f} seconds")
     
@@ -5,39 +5,214 @@ This module uses AI to map source fields to arbitrary target fields specified by
 import json
 import os
 import random
+import re
 import requests
 import aiohttp
 import asyncio
 from typing import Dict, List, Set, Any, Optional, Tuple
 import dotenv
 import csv
+import collections
+import io
+import itertools
 from tqdm import tqdm
 from src.field_utilities import normalize_field_name
 
-dotenv.load_dotenv(".env")
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # ijson is optional; JSON samples are then read with a full parse
+    ijson = None
+
+# .env is read on first use rather than at import time (see _ensure_env)
+_env_loaded = False
+
+def _ensure_env() -> None:
+    """Load the .env file into the environment once, when it is first needed."""
+    global _env_loaded
+    if not _env_loaded:
+        dotenv.load_dotenv(".env")
+        _env_loaded = True
+
+if orjson is not None:
+    def _loads(data: Any) -> Any:
+        """Parse JSON with orjson, falling back to json for input only the stdlib accepts."""
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson rejects NaN/Infinity (and, in some versions, integers
+            # wider than 64 bits), which json.loads reads as before
+            return json.loads(data)
+
+    def _dumps(obj: Any) -> str:
+        """Serialize obj as JSON indented by two spaces."""
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+        except TypeError:
+            # Values orjson rejects (e.g. integers wider than 64 bits)
+            return json.dumps(obj, indent=2)
+else:
+    _loads = json.loads
+
+    def _dumps(obj: Any) -> str:
+        """Serialize obj as JSON indented by two spaces."""
+        return json.dumps(obj, indent=2)
+
+# Flattens line breaks inside CSV cells when samples are shown in the prompt
+_CRLF_TRANS = str.maketrans({'\n': ' ', '\r': None})
+
+# Decoder used to pull the first JSON object out of free-form model replies
+_DECODER = json.JSONDecoder()
+
+def _extract_json(content: str) -> Any:
+    """
+    Parse the first JSON object embedded in a model reply.
+    
+    raw_decode stops at the end of the first complete object, so surrounding
+    prose or code fences do not have to be trimmed with a regex first.
+    
+    Args:
+        content: Reply text that contains a JSON object
+        
+    Returns:
+        The parsed object
+        
+    Raises:
+        json.JSONDecodeError: If no JSON value can be parsed
+    """
+    start = content.find('{')
+    if start < 0:
+        return _loads(content)
+    return _DECODER.raw_decode(content, start)[0]
+
+def _reservoir_sample(iterable, k: int) -> List[Any]:
+    """
+    Draw a uniform random sample of up to k items in one pass (Algorithm R).
+    
+    Only k items are held at any time, so the input never has to be
+    materialized as a list.
+    """
+    reservoir: List[Any] = []
+    for i, item in enumerate(iterable):
+        if i < k:
+            reservoir.append(item)
+        else:
+            j = random.randrange(i + 1)
+            if j < k:
+                reservoir[j] = item
+    return reservoir
+
+def _basename_index(paths) -> Dict[str, str]:
+    """Map each basename to the first path in paths that has it."""
+    index: Dict[str, str] = {}
+    for path in paths:
+        index.setdefault(os.path.basename(path), path)
+    return index
+
+# Default number of files mapped concurrently (in-flight API requests)
+DEFAULT_MAX_CONCURRENCY = 10
+# Default number of files described in a single API request
+DEFAULT_BATCH_SIZE = 1
+# Model used for all mapping requests and the system message sent with them
+MODEL = "google/gemini-2.0-flash-001"
+_SYSTEM_MESSAGE = {"role": "system", "content": "You are a data mapping assistant that helps map source fields to target fields and determine file relevance."}
+
+# Instructions that close every single-file prompt
+_PROMPT_INSTRUCTIONS = """
+Task 1: Determine if this file is relevant to the target fields. A file is relevant if it contains data that can be mapped to at least 2 of the target fields.
+
+Task 2: For each source field, determine which target field it should map to. If a source field doesn't clearly map to any target field, don't map it.
+
+Return your answer as a JSON object with the following structure:
+{
+    "is_relevant": true/false,
+    "reason": "Short and concise explanation of why the file is relevant or not",
+    "mappings": {
+        "source_field1": "target_field1",
+        "source_field2": "target_field2",
+        ...
+    }
+}
+
+JSON response:
+"""
+
+# Longest sample display embedded in a prompt, in characters
+MAX_SAMPLE_CHARS = 4000
+# When streaming a JSON array, samples are drawn from its first
+# max_samples * JSON_SAMPLE_POOL items instead of the whole array
+JSON_SAMPLE_POOL = 10
+# Total time allowed for a single API request, in seconds
+API_TIMEOUT = 60
+# How long resolved addresses of the API host are reused, in seconds
+DNS_CACHE_TTL = 300
 
 class AIFieldMapper:
     """
     Uses AI to map source fields to arbitrary target fields specified by the user.
     """
     
-    def __init__(self, target_fields: List[str], data_description: str = ""):
+    def __init__(self, target_fields: List[str], data_description: str = "",
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, batch_size: int = DEFAULT_BATCH_SIZE):
         """
         Initialize the AI Field Mapper with user-specified target fields.
         
         Args:
             target_fields: List of target fields to map source fields to
             data_description: User-provided description of the data they care about
+            max_concurrency: Maximum number of files mapped (API requests in flight) at once
+            batch_size: Number of files sent to the API in one request
         """
         self.target_fields = target_fields
         self.data_description = data_description
+        self.max_concurrency = max(1, max_concurrency)
+        self.batch_size = max(1, batch_size)
         self.file_mappings: Dict[str, Dict[str, str]] = {}
         self.api_responses: Dict[str, Any] = {}  # Store API responses for logging
         self._session: Optional[aiohttp.ClientSession] = None
+        # API responses keyed by header set, target fields and description:
+        # files sharing a schema reuse one request (see _request_mapping)
+        self._response_cache: Dict[Tuple, asyncio.Future] = {}
+        # Inverse mappings per file path, cleared whenever file_mappings is rebuilt
+        self._inverse_cache: Dict[str, Dict[str, List[str]]] = {}
+        # Files with at least one mapping, built on first use (see _mapped_files)
+        self._mapped_view: Optional[Dict[str, Dict[str, str]]] = None
+        self._prepare_prompt_context()
+    
+    def _prepare_prompt_context(self) -> None:
+        """
+        Precompute the prompt text and cache key parts that do not depend on the file.
+        
+        Called on construction and again at the start of build_mappings, since
+        target_fields and data_description are public and may be replaced.
+        """
+        user_description = f"\n\nUser description of relevant data: {self.data_description}" if self.data_description else ""
+        self._prompt_targets = f"Target fields: {', '.join(self.target_fields)}{user_description}"
+        self._targets_key = (tuple(sorted(self.target_fields)), self.data_description)
         
     async def __aenter__(self):
         """Async context manager entry."""
-        self._session = aiohttp.ClientSession()
+        _ensure_env()
+        
+        # One session for all requests, so keep-alive connections to the API
+        # host are reused instead of paying a TCP/TLS handshake per file
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrency,
+            limit_per_host=self.max_concurrency,
+            ttl_dns_cache=DNS_CACHE_TTL
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=API_TIMEOUT),
+            headers={
+                "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY', '')}",
+                "Content-Type": "application/json"
+            }
+        )
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -54,53 +229,83 @@ class AIFieldMapper:
             file_metadata: List of dicts with file metadata including headers
         """
         if not self._session:
-            self._session = aiohttp.ClientSession()
+            raise RuntimeError("AIFieldMapper must be used as an async context manager (async with AIFieldMapper(...))")
+        
+        # Bound the number of in-flight requests; created here so it belongs
+        # to the running event loop
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        loop = asyncio.get_running_loop()
+        
+        async def guarded(batch_info):
+            async with semaphore:
+                # Read the samples in a worker thread so file I/O overlaps with
+                # the requests already in flight instead of blocking the loop
+                batch = []
+                for file_info in batch_info:
+                    file_path = file_info['path']
+                    headers = file_info['headers']
+                    sample_data, sample_format = await loop.run_in_executor(
+                        None, self._get_sample_data_sync, file_path, headers
+                    )
+                    batch.append((headers, file_path, sample_data, sample_format))
+                if len(batch) == 1:
+                    return [await self._map_headers_with_ai(*batch[0])]
+                return await self._map_headers_with_ai_batch(batch)
+        
+        targets_set = frozenset(self.target_fields)
+        self._prepare_prompt_context()
         
         # Create progress bar
         pbar = tqdm(total=len(file_metadata), desc="Processing files")
         
         try:
-            tasks = []
-            for file_info in file_metadata:
-                file_path = file_info['path']
-                headers = file_info['headers']
-                
-                # Get sample data from the file
-                sample_data, sample_format = self._get_sample_data(file_path, headers)
+            tasks = {}
+            for start in range(0, len(file_metadata), self.batch_size):
+                batch_info = file_metadata[start:start + self.batch_size]
                 
-                # Create mapping for this file
-                self.file_mappings[file_path] = {}
+                # Create mapping for each file
+                for file_info in batch_info:
+                    self.file_mappings[file_info['path']] = {}
                 
-                # Create task for mapping headers
-                task = asyncio.create_task(
-                    self._map_headers_with_ai(headers, file_path, sample_data, sample_format)
-                )
-                tasks.append((file_path, task))
-            
-            # Process all tasks and update progress
-            for file_path, task in tasks:
-                try:
-                    header_mappings, is_relevant = await task
+                # Create task for mapping the headers of this batch of files
+                task = asyncio.create_task(guarded(batch_info))
+                tasks[task] = [file_info['path'] for file_info in batch_info]
+            
+            # Process tasks as they finish so the progress bar is not held
+            # up by one slow request
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    file_paths = tasks[task]
+                    try:
+                        results = task.result()
+                    except Exception as e:
+                        for file_path in file_paths:
+                            print(f"Error processing {file_path}: {str(e)}")
+                        pbar.update(len(file_paths))
+                        continue
                     
-                    # Only store mappings if the file is relevant
-                    if is_relevant:
-                        for header, target_field in header_mappings.items():
-                            if target_field in self.target_fields:
-                                self.file_mappings[file_path][header] = target_field
-                    else:
-                        # Create an empty mapping to indicate the file was processed but deemed irrelevant
-                        print(f"File {os.path.basename(file_path)} was deemed irrelevant to the target fields and will be skipped.")
-                except Exception as e:
-                    print(f"Error processing {file_path}: {str(e)}")
-                finally:
-                    pbar.update(1)
+                    for file_path, (header_mappings, is_relevant) in zip(file_paths, results):
+                        # Only store mappings if the file is relevant
+                        if is_relevant:
+                            for header, target_field in header_mappings.items():
+                                if target_field in targets_set:
+                                    self.file_mappings[file_path][header] = target_field
+                        else:
+                            # Create an empty mapping to indicate the file was processed but deemed irrelevant
+                            print(f"File {os.path.basename(file_path)} was deemed irrelevant to the target fields and will be skipped.")
+                        pbar.update(1)
         finally:
             pbar.close()
+            self._invalidate_views()
     
-    def _get_sample_data(self, file_path: str, headers: List[str], max_samples: int = 2) -> Tuple[Any, str]:
+    def _get_sample_data_sync(self, file_path: str, headers: List[str], max_samples: int = 2) -> Tuple[Any, str]:
         """
         Extract sample data from a file to help determine relevance.
         Returns the data in its native format along with format type.
+        This does blocking file I/O; build_mappings runs it in a worker thread.
         
         Args:
             file_path: Path to the file
@@ -120,7 +325,6 @@ class AIFieldMapper:
                 with open(file_path, 'r', newline='', encoding='utf-8', errors='replace') as f:
                     # Try to detect dialect
                     sample_text = f.read(4096)
-                    f.seek(0)
                     
                     try:
                         dialect = csv.Sniffer().sniff(sample_text)
@@ -129,29 +333,21 @@ class AIFieldMapper:
                         dialect = csv.excel
                         has_header = True
                     
-                    reader = csv.reader(f, dialect)
+                    # Reuse the block already read (completed to the end of its
+                    # last line) instead of seeking back and reading it again
+                    head = io.StringIO(sample_text + f.readline(), newline='')
+                    reader = csv.reader(itertools.chain(head, f), dialect)
                     
                     # Skip header if present
                     if has_header:
                         next(reader)
                     
                     # Get sample rows as arrays (native CSV format)
-                    rows = []
-                    for i, row in enumerate(reader):
-                        if i >= max_samples:
-                            break
-                        rows.append(row)
+                    rows = list(itertools.islice(reader, max_samples))
                     
                     # Also create a list of dictionaries for internal use
-                    sample_dicts = []
-                    for row in rows:
-                        if len(row) >= min(len(headers), 1):
-                            sample = {}
-                            for i, header in enumerate(headers):
-                                if i < len(row):
-                                    sample[header] = row[i]
-                            if sample:
-                                sample_dicts.append(sample)
+                    # (zip stops at the shorter of headers and row)
+                    sample_dicts = [dict(zip(headers, row)) for row in rows if row and headers]
                     
                     # Return both the raw rows and header mapping for CSV
                     return {
@@ -161,8 +357,7 @@ class AIFieldMapper:
                     }, "csv"
             
             elif ext == 'json':
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                data = self._load_json_sample(file_path, max_samples)
                 
                 if isinstance(data, list) and data:
                     # Get random samples from the list
@@ -243,6 +438,36 @@ class AIFieldMapper:
             "empty_sample": {header: "" for header in headers[:min(5, len(headers))]}
         }, "unknown"
     
+    def _load_json_sample(self, file_path: str, max_samples: int) -> Any:
+        """
+        Load a JSON file, or only the start of it when it is a top-level array.
+        
+        With ijson installed, an array is streamed and parsing stops after
+        max_samples * JSON_SAMPLE_POOL items, so a huge file is not read and
+        parsed in full just to pick a few samples; the samples are drawn while
+        streaming, so only max_samples items are kept. Anything else, or an
+        array ijson cannot read, is parsed whole.
+        
+        Args:
+            file_path: Path to the JSON file
+            max_samples: Number of samples that will be drawn
+            
+        Returns:
+            The parsed document, or for a streamed array a random sample of at
+            most max_samples of its leading items
+        """
+        with open(file_path, 'rb') as f:
+            if ijson is not None and f.read(4096).lstrip()[:1] == b'[':
+                f.seek(0)
+                items = ijson.items(f, 'item', use_float=True)
+                try:
+                    return _reservoir_sample(itertools.islice(items, max_samples * JSON_SAMPLE_POOL), max_samples)
+                except ijson.JSONError:
+                    # ijson rejects NaN/Infinity, which the full parse accepts
+                    pass
+            f.seek(0)
+            return _loads(f.read().decode('utf-8'))
+    
     async def _map_headers_with_ai(self, headers: List[str], file_path: str, sample_data: Any, sample_format: str) -> Tuple[Dict[str, str], bool]:
         """
         Use AI to map headers to target fields and determine if the file is relevant.
@@ -258,6 +483,7 @@ class AIFieldMapper:
                 header_mappings: Dictionary mapping original headers to target fields
                 is_relevant: Boolean indicating if the file is relevant to the target fields
         """
+        _ensure_env()
         api_key = os.getenv("OPENROUTER_API_KEY")
         if not api_key:
             print(f"Error: OPENROUTER_API_KEY not found in environment. Cannot process {file_path}.")
@@ -265,119 +491,285 @@ class AIFieldMapper:
         
         # Format sample data for display based on file format
         sample_display = self._format_sample_for_display(sample_data, sample_format)
+        file_name = os.path.basename(file_path)
         
-        # Prepare the prompt for the API
-        user_description = f"\n\nUser description of relevant data: {self.data_description}" if self.data_description else ""
+        # Prepare the prompt for the API; only the file-specific parts are
+        # formatted here, the rest is prepared once per run
+        file_format = sample_format.upper()
+        prompt = (
+            "Analyze this file and determine if it contains relevant data for the specified target fields.\n\n"
+            f"File name: {file_name}\n"
+            f"File format: {file_format}\n"
+            f"Source fields: {', '.join(headers)}\n"
+            f"{self._prompt_targets}\n\n"
+            f"Here are some sample rows from the file in its native {file_format} format:\n"
+            f"{sample_display}\n"
+            f"{_PROMPT_INSTRUCTIONS}"
+        )
         
-        prompt = f"""Analyze this file and determine if it contains relevant data for the specified target fields.
-
-File name: {os.path.basename(file_path)}
+        # Make the API request (auth headers are set on the session)
+        data = {
+            "model": MODEL,
+            "messages": [_SYSTEM_MESSAGE, {"role": "user", "content": prompt}],
+            "max_tokens": 800
+        }
+        
+        cache_key = (tuple(sorted(headers)),) + self._targets_key
+        
+        try:
+            content = await self._request_mapping(cache_key, data)
+            
+            # Store the API response for logging
+            api_data = self.api_responses[file_name] = {
+                "prompt": prompt,
+                "response": content,
+                "headers": headers,
+                "sample_format": sample_format,
+                "sample_display": sample_display
+            }
+            
+            # Try to parse the JSON object from the response, keeping the result
+            # so the report does not have to parse it again
+            try:
+                response_data = _extract_json(content)
+                api_data["parsed"] = response_data
+                return self._validate_response(response_data, headers, file_name)
+                
+            except json.JSONDecodeError:
+                print(f"Error parsing API response as JSON for {file_path}: {content}")
+                return {}, False
+                
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"API request error for {file_path}: {e}")
+            return {}, False
+    
+    async def _map_headers_with_ai_batch(self, batch: List[Tuple[List[str], str, Any, str]]) -> List[Tuple[Dict[str, str], bool]]:
+        """
+        Use AI to map the headers of several files in a single API request.
+        
+        The files are described in numbered sections of one prompt and the model
+        answers with one result per file, so the instructions and the round trip
+        are shared by the whole batch.
+        
+        Args:
+            batch: List of (headers, file_path, sample_data, sample_format) tuples
+            
+        Returns:
+            List of (header_mappings, is_relevant) tuples, in the order of batch
+        """
+        _ensure_env()
+        api_key = os.getenv("OPENROUTER_API_KEY")
+        if not api_key:
+            for _, file_path, _, _ in batch:
+                print(f"Error: OPENROUTER_API_KEY not found in environment. Cannot process {file_path}.")
+            return [({}, False)] * len(batch)
+        
+        # Describe every file in its own numbered section
+        file_names = [os.path.basename(file_path) for _, file_path, _, _ in batch]
+        sections = []
+        sample_displays = []
+        for number, (headers, file_path, sample_data, sample_format) in enumerate(batch, 1):
+            sample_display = self._format_sample_for_display(sample_data, sample_format)
+            sample_displays.append(sample_display)
+            sections.append(f"""File {number}
+File name: {file_names[number - 1]}
 File format: {sample_format.upper()}
 Source fields: {", ".join(headers)}
-Target fields: {", ".join(self.target_fields)}{user_description}
 
 Here are some sample rows from the file in its native {sample_format.upper()} format:
-{sample_display}
+{sample_display}""")
+        
+        prompt = f"""Analyze each of the following {len(batch)} files and determine if it contains relevant data for the specified target fields.
 
-Task 1: Determine if this file is relevant to the target fields. A file is relevant if it contains data that can be mapped to at least 2 of the target fields.
+{self._prompt_targets}
 
-Task 2: For each source field, determine which target field it should map to. If a source field doesn't clearly map to any target field, don't map it.
+{chr(10).join(sections)}
 
-Return your answer as a JSON object with the following structure:
+Task 1: For each file, determine if it is relevant to the target fields. A file is relevant if it contains data that can be mapped to at least 2 of the target fields.
+
+Task 2: For each source field of each file, determine which target field it should map to. If a source field doesn't clearly map to any target field, don't map it.
+
+Return your answer as a JSON object with one entry per file, using the file numbers above:
 {{
-    "is_relevant": true/false,
-    "reason": "Short and concise explanation of why the file is relevant or not",
-    "mappings": {{
-        "source_field1": "target_field1",
-        "source_field2": "target_field2",
+    "files": [
+        {{
+            "file": 1,
+            "is_relevant": true/false,
+            "reason": "Short and concise explanation of why the file is relevant or not",
+            "mappings": {{
+                "source_field1": "target_field1",
+                "source_field2": "target_field2",
+                ...
+            }}
+        }},
         ...
-    }}
+    ]
 }}
 
 JSON response:
 """
         
-        # Make the API request
-        headers_dict = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
+        # Make the API request (auth headers are set on the session)
         data = {
-            "model": "google/gemini-2.0-flash-001",
-            "messages": [
-                {"role": "system", "content": "You are a data mapping assistant that helps map source fields to target fields and determine file relevance."},
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": 800
+            "model": MODEL,
+            "messages": [_SYSTEM_MESSAGE, {"role": "user", "content": prompt}],
+            "max_tokens": 800 * len(batch)
         }
         
         try:
-            async with self._session.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers_dict,
-                json=data
-            ) as response:
-                response.raise_for_status()
-                result = await response.json()
-                content = result['choices'][0]['message']['content']
+            content = await self._post_completion(data)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            for _, file_path, _, _ in batch:
+                print(f"API request error for {file_path}: {e}")
+            return [({}, False)] * len(batch)
+        
+        # Index the per-file results by their file number
+        entries = {}
+        try:
+            response_data = _extract_json(content)
+            for entry in response_data.get("files", []):
+                if isinstance(entry, dict):
+                    # Models sometimes quote the file number ("1" instead of 1)
+                    try:
+                        entries[int(entry.get("file"))] = entry
+                    except (TypeError, ValueError):
+                        continue
+        except (json.JSONDecodeError, AttributeError) as e:
+            print(f"Error parsing batched API response as JSON: {e}")
+        
+        results = []
+        for number, (headers, file_path, _, sample_format) in enumerate(batch, 1):
+            entry = entries.get(number)
             
-            # Store the API response for logging
-            self.api_responses[os.path.basename(file_path)] = {
+            # Store this file's part of the response for logging, in the same
+            # shape as a single-file response so the reports can read it
+            file_name = file_names[number - 1]
+            api_data = self.api_responses[file_name] = {
                 "prompt": prompt,
-                "response": content,
+                "response": _dumps(entry) if entry is not None else content,
                 "headers": headers,
-                "sample_data": sample_data,
                 "sample_format": sample_format,
-                "sample_display": sample_display
+                "sample_display": sample_displays[number - 1]
             }
+            if entry is not None:
+                api_data["parsed"] = entry
             
-            # Try to parse the JSON object from the response
-            try:
-                # First, try to find JSON object in the response if it's not a clean JSON
-                import re
-                json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                if json_match:
-                    content = json_match.group(0)
-                
-                response_data = json.loads(content)
-                
-                # Extract relevance determination
-                is_relevant = response_data.get("is_relevant", False)
-                reason = response_data.get("reason", "No reason provided")
-                
-                # If the file is deemed irrelevant, log the reason
-                if not is_relevant:
-                    print(f"File {os.path.basename(file_path)} deemed irrelevant: {reason}")
-                
-                # Extract mappings
-                mappings = response_data.get("mappings", {})
-                
-                # Validate the mappings
-                validated_mappings = {}
-                for source, target in mappings.items():
-                    if source in headers and target in self.target_fields:
-                        validated_mappings[source] = target
-                
-                # Check if we have at least 2 valid mappings (if the file is deemed relevant)
-                if is_relevant and len(validated_mappings) < 2:
-                    print(f"Warning: File {os.path.basename(file_path)} was marked as relevant but has fewer than 2 valid mappings. It will be skipped.")
-                    is_relevant = False
-                
-                return validated_mappings, is_relevant
-                
-            except json.JSONDecodeError:
-                print(f"Error parsing API response as JSON for {file_path}: {content}")
-                return {}, False
-                
-        except aiohttp.ClientError as e:
-            print(f"API request error for {file_path}: {e}")
-            return {}, False
+            if entry is None:
+                print(f"Error: No result for {file_path} in the batched API response.")
+                results.append(({}, False))
+            else:
+                results.append(self._validate_response(entry, headers, file_name))
+        
+        return results
+    
+    def _validate_response(self, response_data: Dict[str, Any], headers: List[str], file_name: str) -> Tuple[Dict[str, str], bool]:
+        """
+        Validate the parsed AI answer for one file.
+        
+        Args:
+            response_data: Parsed JSON answer with is_relevant, reason and mappings
+            headers: List of headers of the file
+            file_name: Base name of the file, used in log messages
+            
+        Returns:
+            Tuple of (header_mappings, is_relevant)
+        """
+        # Extract relevance determination
+        is_relevant = response_data.get("is_relevant", False)
+        reason = response_data.get("reason", "No reason provided")
+        
+        # If the file is deemed irrelevant, log the reason
+        if not is_relevant:
+            print(f"File {file_name} deemed irrelevant: {reason}")
+        
+        # Extract mappings
+        mappings = response_data.get("mappings", {})
+        
+        # Validate the mappings against sets, so each check is O(1); the model
+        # may return non-string targets, which can never match a target field
+        headers_set = frozenset(headers)
+        targets_set = frozenset(self.target_fields)
+        validated_mappings = {}
+        for source, target in mappings.items():
+            if isinstance(target, str) and source in headers_set and target in targets_set:
+                validated_mappings[source] = target
+        
+        # Check if we have at least 2 valid mappings (if the file is deemed relevant)
+        if is_relevant and len(validated_mappings) < 2:
+            print(f"Warning: File {file_name} was marked as relevant but has fewer than 2 valid mappings. It will be skipped.")
+            is_relevant = False
+        
+        return validated_mappings, is_relevant
+    
+    async def _request_mapping(self, cache_key: Tuple, data: Dict[str, Any]) -> str:
+        """
+        Send a mapping request to the API, or reuse the response for the same key.
+        
+        The mapping decision is driven by the headers, so files sharing a schema
+        are answered by one request. Concurrent callers with the same key wait on
+        the request already in flight; failed requests are not cached.
+        
+        Args:
+            cache_key: Key identifying the header set, target fields and description
+            data: Request body for the chat completions endpoint
+            
+        Returns:
+            Content of the model's reply
+        """
+        future = self._response_cache.get(cache_key)
+        if future is None:
+            future = asyncio.ensure_future(self._post_completion(data))
+            self._response_cache[cache_key] = future
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            # Let a later file with this schema retry
+            if self._response_cache.get(cache_key) is future:
+                del self._response_cache[cache_key]
+            raise
+    
+    async def _post_completion(self, data: Dict[str, Any]) -> str:
+        """
+        Post a request body to the chat completions endpoint.
+        
+        Args:
+            data: Request body
+            
+        Returns:
+            Content of the model's reply
+        """
+        async with self._session.post(
+            "https://openrouter.ai/api/v1/chat/completions",
+            json=data
+        ) as response:
+            response.raise_for_status()
+            # Decode the body with orjson when available instead of the stdlib parser
+            result = await response.json(loads=_loads)
+            return result['choices'][0]['message']['content']
     
     def _format_sample_for_display(self, sample_data: Any, sample_format: str) -> str:
         """
         Format sample data for display in the prompt based on file format.
         
+        The result is capped at MAX_SAMPLE_CHARS so a large sample (e.g. a JSON
+        file holding one big object) does not inflate the prompt.
+        
+        Args:
+            sample_data: Sample data in native format
+            sample_format: Format of the sample data
+            
+        Returns:
+            Formatted string representation of the sample data
+        """
+        sample_display = self._render_sample(sample_data, sample_format)
+        if len(sample_display) > MAX_SAMPLE_CHARS:
+            sample_display = sample_display[:MAX_SAMPLE_CHARS] + "\n...[truncated]"
+        return sample_display
+    
+    def _render_sample(self, sample_data: Any, sample_format: str) -> str:
+        """
+        Render sample data as text in its native format, without a size limit.
+        
         Args:
             sample_data: Sample data in native format
             sample_format: Format of the sample data
@@ -394,18 +786,18 @@ JSON response:
                 result.append("Header row: " + ", ".join(sample_data["headers"]))
             if "rows" in sample_data and sample_data["rows"]:
                 for i, row in enumerate(sample_data["rows"]):
-                    result.append(f"{i+1}: " + ", ".join(str(cell).replace('\n', ' ').replace('\r', '') for cell in row))
+                    result.append(f"{i+1}: " + ", ".join(str(cell).translate(_CRLF_TRANS) for cell in row))
             return "\n".join(result)
         
         elif sample_format == "json":
             # Format JSON sample nicely
             if "raw_data" in sample_data:
                 if isinstance(sample_data["raw_data"], list):
-                    return json.dumps(sample_data["raw_data"][:3], indent=2)
+                    return _dumps(sample_data["raw_data"][:3])
                 else:
-                    return json.dumps(sample_data["raw_data"], indent=2)
+                    return _dumps(sample_data["raw_data"])
             elif "filtered_data" in sample_data:
-                return json.dumps(sample_data["filtered_data"], indent=2)
+                return _dumps(sample_data["filtered_data"])
             else:
                 return "Could not format JSON sample data."
         
@@ -427,7 +819,7 @@ JSON response:
         
         else:
             # Default format as JSON for unknown types
-            return json.dumps(sample_data, indent=2)
+            return _dumps(sample_data)
     
     def save_mappings(self, output_path: str) -> None:
         """
@@ -456,7 +848,7 @@ JSON response:
             }
         
         with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(formatted_mappings, f, indent=2)
+            f.write(_dumps(formatted_mappings))
     
     def save_analysis_report(self, output_path: str) -> None:
         """
@@ -465,50 +857,59 @@ JSON response:
         Args:
             output_path: Path to save the analysis report
         """
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write("# Ultimate Parser AI Analysis Report\n\n")
+        # Index mapped paths by basename once instead of scanning them per file
+        basename_index = _basename_index(self.file_mappings)
+        
+        # Build the whole report in memory and write it with a single call
+        parts: List[str] = []
+        write = parts.append
+        
+        write("# Ultimate Parser AI Analysis Report\n\n")
+        
+        for file_name, api_data in self.api_responses.items():
+            write(f"## File: {file_name}\n\n")
             
-            for file_name, api_data in self.api_responses.items():
-                f.write(f"## File: {file_name}\n\n")
-                
-                # Write headers
-                f.write("### Headers\n")
-                f.write("```\n")
-                f.write(", ".join(api_data["headers"]))
-                f.write("\n```\n\n")
-                
-                # Write sample data in native format
-                f.write(f"### Sample Data ({api_data.get('sample_format', 'unknown').upper()})\n")
-                f.write("```\n")
-                if "sample_display" in api_data:
-                    f.write(api_data["sample_display"])
-                else:
-                    f.write(json.dumps(api_data["sample_data"], indent=2))
-                f.write("\n```\n\n")
-                
-                # Write prompt
-                f.write("### API Prompt\n")
-                f.write("```\n")
-                f.write(api_data["prompt"])
-                f.write("\n```\n\n")
-                
-                # Write response
-                f.write("### API Response\n")
-                f.write("```\n")
-                f.write(api_data["response"])
-                f.write("\n```\n\n")
-                
-                # Write mappings if available
-                if file_name in [os.path.basename(path) for path in self.file_mappings]:
-                    file_path = next(path for path in self.file_mappings if os.path.basename(path) == file_name)
-                    mappings = self.file_mappings[file_path]
-                    
-                    f.write("### Final Mappings\n")
-                    f.write("```json\n")
-                    f.write(json.dumps(mappings, indent=2))
-                    f.write("\n```\n\n")
+            # Write headers
+            write("### Headers\n")
+            write("```\n")
+            write(", ".join(api_data["headers"]))
+            write("\n```\n\n")
+            
+            # Write sample data in native format
+            write(f"### Sample Data ({api_data.get('sample_format', 'unknown').upper()})\n")
+            write("```\n")
+            if "sample_display" in api_data:
+                write(api_data["sample_display"])
+            else:
+                write("<no sample display>")
+            write("\n```\n\n")
+            
+            # Write prompt
+            write("### API Prompt\n")
+            write("```\n")
+            write(api_data["prompt"])
+            write("\n```\n\n")
+            
+            # Write response
+            write("### API Response\n")
+            write("```\n")
+            write(api_data["response"])
+            write("\n```\n\n")
+            
+            # Write mappings if available
+            file_path = basename_index.get(file_name)
+            if file_path is not None:
+                mappings = self.file_mappings[file_path]
                 
-                f.write("---\n\n")
+                write("### Final Mappings\n")
+                write("```json\n")
+                write(_dumps(mappings))
+                write("\n```\n\n")
+            
+            write("---\n\n")
+        
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write("".join(parts))
     
     def load_mappings(self, input_path: str) -> None:
         """
@@ -518,10 +919,11 @@ JSON response:
             input_path: Path to the mappings file
         """
         with open(input_path, 'r', encoding='utf-8') as f:
-            formatted_mappings = json.load(f)
+            formatted_mappings = _loads(f.read())
         
         # Convert back to our internal format
         self.file_mappings = {}
+        self._invalidate_views()
         for basename, data in formatted_mappings.items():
             full_path = data.get("_full_path", basename)
             self.file_mappings[full_path] = data["mappings"]
@@ -556,16 +958,41 @@ JSON response:
             
         Returns:
             Dictionary mapping target fields to lists of original headers
+            (cached per file; treat it as read-only)
         """
+        inverse_mapping = self._inverse_cache.get(file_path)
+        if inverse_mapping is not None:
+            return inverse_mapping
+        
         mapping = self.get_field_mapping(file_path)
-        inverse_mapping: Dict[str, List[str]] = {field: [] for field in self.target_fields}
+        inverse_mapping = {field: [] for field in self.target_fields}
         
         for header, target_field in mapping.items():
             if target_field in inverse_mapping:
                 inverse_mapping[target_field].append(header)
         
+        self._inverse_cache[file_path] = inverse_mapping
         return inverse_mapping
     
+    def _invalidate_views(self) -> None:
+        """Drop the views derived from file_mappings after it has been rebuilt."""
+        self._inverse_cache.clear()
+        self._mapped_view = None
+    
+    def _mapped_files(self) -> Dict[str, Dict[str, str]]:
+        """
+        Get the files that have at least one mapping.
+        
+        The filtered view is built once per set of mappings and shared by the
+        accessors below instead of each re-filtering file_mappings.
+        
+        Returns:
+            Dictionary mapping file paths to their (non-empty) header mappings
+        """
+        if self._mapped_view is None:
+            self._mapped_view = {k: v for k, v in self.file_mappings.items() if v}  # Filter out empty mappings
+        return self._mapped_view
+    
     def get_all_mappings(self) -> Dict[str, Dict[str, str]]:
         """
         Get all file mappings.
@@ -573,7 +1000,7 @@ JSON response:
         Returns:
             Dictionary mapping file paths to their header mappings
         """
-        return {k: v for k, v in self.file_mappings.items() if v}  # Filter out empty mappings
+        return dict(self._mapped_files())
     
     def get_all_file_paths(self) -> List[str]:
         """
@@ -582,7 +1009,7 @@ JSON response:
         Returns:
             List of file paths found in the mappings
         """
-        return [path for path, mappings in self.file_mappings.items() if mappings]  # Filter out empty mappings
+        return list(self._mapped_files())
     
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -592,24 +1019,29 @@ JSON response:
             Dictionary with mapping statistics
         """
         # Filter out files with empty mappings or fewer than 2 mappings
-        valid_mappings = {path: mappings for path, mappings in self.file_mappings.items() 
-                         if mappings and len(mappings) >= 2}
+        valid_mappings = {path: mappings for path, mappings in self._mapped_files().items()
+                         if len(mappings) >= 2}
         
         stats = {
             "total_files": len(valid_mappings),
             "field_counts": {field: 0 for field in self.target_fields}
         }
         
-        for file_path, mappings in valid_mappings.items():
-            # Count fields by type
-            for header, target_field in mappings.items():
-                if target_field in stats["field_counts"]:
-                    stats["field_counts"][target_field] += 1
+        # Count fields by type in one C-level pass over all mapped fields
+        counts = collections.Counter()
+        for mappings in valid_mappings.values():
+            counts.update(mappings.values())
+        field_counts = stats["field_counts"]
+        for target_field, count in counts.items():
+            if target_field in field_counts:
+                field_counts[target_field] += count
         
         return stats
 
 
-async def create_ai_field_mappings(file_metadata: List[Dict[str, Any]], target_fields: List[str], data_description: str = "") -> AIFieldMapper:
+async def create_ai_field_mappings(file_metadata: List[Dict[str, Any]], target_fields: List[str], data_description: str = "",
+                                   max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                                   batch_size: int = DEFAULT_BATCH_SIZE) -> AIFieldMapper:
     """
     Create AI-based field mappings from file metadata.
     
@@ -617,11 +1049,13 @@ async def create_ai_field_mappings(file_metadata: List[Dict[str, Any]], target_f
         file_metadata: List of dicts with file metadata including headers
         target_fields: List of target fields to map to
         data_description: User-provided description of the data they care about
+        max_concurrency: Maximum number of API requests in flight at once
+        batch_size: Number of files sent to the API in one request
         
     Returns:
         AIFieldMapper instance with the mappings
     """
-    async with AIFieldMapper(target_fields, data_description) as mapper:
+    async with AIFieldMapper(target_fields, data_description, max_concurrency, batch_size) as mapper:
         await mapper.build_mappings(file_metadata)
         return mapper
 
@@ -679,22 +1113,21 @@ def format_ai_mappings_report(mapper: AIFieldMapper) -> str:
     too_few_mappings = []
     ai_rejected = []
     
+    # Index mapped paths by basename once instead of scanning them per file
+    basename_index = _basename_index(mapper.file_mappings)
+    
     # Process each file that was analyzed
     for file_name, api_data in mapper.api_responses.items():
         try:
-            # First try to find JSON object in the response if it's not a clean JSON
-            import re
-            content = api_data["response"]
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                content = json_match.group(0)
-            
-            response_data = json.loads(content)
+            # Reuse the answer parsed during mapping when there is one
+            response_data = api_data.get("parsed")
+            if response_data is None:
+                response_data = _extract_json(api_data["response"])
             is_relevant = response_data.get("is_relevant", False)
             reason = response_data.get("reason", "No reason provided")
             
             # Get the file path if it exists in mappings
-            file_path = next((path for path in mapper.file_mappings if os.path.basename(path) == file_name), None)
+            file_path = basename_index.get(file_name)
             
             if not is_relevant:
                 # File was rejected by AI
@@ -11,16 +11,64 @@ from typing import Dict, List, Any, Optional, Tuple
 import dotenv
 from tqdm import tqdm
 import datetime
+import shutil
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
 
 dotenv.load_dotenv(".env")
 
+# Number of validation batches sent to the API concurrently
+MAX_CONCURRENT_BATCHES = 8
+# Connection pool size for the API session (above the batch concurrency)
+CONNECTION_LIMIT = 16
+# Total time allowed for one validation request, in seconds
+API_TIMEOUT = 60
+# How long resolved addresses of the API host are reused, in seconds
+DNS_CACHE_TTL = 300
+# Write buffer for a streamed debug log
+DEBUG_LOG_BUFFER_SIZE = 64 * 1024
+# Shared decoder for pulling the JSON object out of a model reply
+_JSON_DECODER = json.JSONDecoder()
+
+if orjson is not None:
+    def _loads(data: Any) -> Any:
+        """Parse JSON with orjson, falling back to json for input only the stdlib accepts."""
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson rejects NaN/Infinity (and, in some versions, integers
+            # wider than 64 bits), which json.loads reads as before
+            return json.loads(data)
+
+    def _dumps_bytes(obj: Any, pretty: bool = False) -> bytes:
+        """Serialize obj as UTF-8 JSON, indented by two spaces when pretty."""
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+        except TypeError:
+            # Values orjson rejects (e.g. integers wider than 64 bits)
+            if pretty:
+                return json.dumps(obj, indent=2).encode('utf-8')
+            return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+else:
+    _loads = json.loads
+
+    def _dumps_bytes(obj: Any, pretty: bool = False) -> bytes:
+        """Serialize obj as UTF-8 JSON, indented by two spaces when pretty."""
+        if pretty:
+            return json.dumps(obj, indent=2).encode('utf-8')
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
 
 class AIMappingValidator:
     """
     Uses AI to validate and correct existing field mappings from a mappings.json file.
     """
     
-    def __init__(self, target_fields: List[str], data_description: str = "", debug: bool = True):
+    def __init__(self, target_fields: List[str], data_description: str = "", debug: bool = True,
+                 debug_log_path: Optional[str] = None, debug_pretty: bool = False):
         """
         Initialize the AI Mapping Validator.
         
@@ -28,14 +76,25 @@ class AIMappingValidator:
             target_fields: List of target fields that mappings should map to
             data_description: User-provided description of the data they care about
             debug: Whether to enable debug logging to file
+            debug_log_path: If set, debug entries are streamed to this file as they
+                are logged instead of being kept in memory until save_debug_log
+            debug_pretty: Indent the JSON data attached to debug entries
         """
-        self.target_fields = target_fields
+        self.target_fields = list(target_fields)
+        # Hashed view of the targets for the per-mapping membership checks
+        self._target_set = frozenset(self.target_fields)
         self.data_description = data_description
         self.original_mappings: Dict[str, Any] = {}
         self.corrected_mappings: Dict[str, Any] = {}
+        # Set by load_mappings: the input keyed by full path, and its format
+        self._normalized_original: Dict[str, Dict[str, str]] = {}
+        self._is_traditional = False
         self._session: Optional[aiohttp.ClientSession] = None
         self.debug = debug
         self.debug_log = []
+        self.debug_log_path = debug_log_path
+        self.debug_pretty = debug_pretty
+        self._debug_file = None
         
     def _log_debug(self, message: str, data: Any = None):
         """Add debug message to log."""
@@ -43,28 +102,74 @@ class AIMappingValidator:
             timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             log_entry = f"[{timestamp}] {message}"
             if data is not None:
-                log_entry += f"\n{json.dumps(data, indent=2)}"
-            self.debug_log.append(log_entry)
+                log_entry += "\n" + _dumps_bytes(data, self.debug_pretty).decode('utf-8')
+            
+            if self.debug_log_path is None:
+                self.debug_log.append(log_entry)
+                return
+            
+            # Stream the entry so the log does not accumulate in memory
+            if self._debug_file is None:
+                self._debug_file = open(self.debug_log_path, 'w', encoding='utf-8',
+                                        buffering=DEBUG_LOG_BUFFER_SIZE)
+                self._debug_file.write(self._debug_log_header())
+            self._debug_file.write(log_entry + "\n\n")
+    
+    @staticmethod
+    def _debug_log_header() -> str:
+        """Title written at the top of a debug log file."""
+        return "AI Mapping Validator Debug Log\n" + "=" * 50 + "\n\n"
+    
+    def _close_debug_log(self):
+        """Flush and close the streamed debug log, if one is open."""
+        if self._debug_file is not None:
+            self._debug_file.close()
+            self._debug_file = None
             
     def save_debug_log(self, output_path: str = "validator_debug.log"):
         """Save debug log to file."""
-        if self.debug and self.debug_log:
+        if not self.debug:
+            return
+        
+        if self.debug_log_path is not None:
+            # Entries were streamed already; finish the file and copy it if
+            # it was asked for somewhere else
+            self._close_debug_log()
+            if (os.path.exists(self.debug_log_path)
+                    and os.path.abspath(output_path) != os.path.abspath(self.debug_log_path)):
+                shutil.copyfile(self.debug_log_path, output_path)
+            return
+        
+        if self.debug_log:
             with open(output_path, 'w', encoding='utf-8') as f:
-                f.write("AI Mapping Validator Debug Log\n")
-                f.write("=" * 50 + "\n\n")
+                f.write(self._debug_log_header())
                 for entry in self.debug_log:
                     f.write(entry + "\n\n")
         
     async def __aenter__(self):
         """Async context manager entry."""
-        self._session = aiohttp.ClientSession()
+        self._session = self._create_session()
         return self
     
+    @staticmethod
+    def _create_session() -> aiohttp.ClientSession:
+        """Create an API session whose connection pool allows the batches to run concurrently."""
+        connector = aiohttp.TCPConnector(
+            limit=CONNECTION_LIMIT,
+            limit_per_host=CONNECTION_LIMIT,
+            ttl_dns_cache=DNS_CACHE_TTL
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=API_TIMEOUT)
+        )
+    
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit."""
         if self._session:
             await self._session.close()
             self._session = None
+        self._close_debug_log()
     
     def load_mappings(self, mappings_path: str) -> None:
         """
@@ -73,31 +178,46 @@ class AIMappingValidator:
         Args:
             mappings_path: Path to the mappings.json file
         """
-        with open(mappings_path, 'r', encoding='utf-8') as f:
-            self.original_mappings = json.load(f)
+        with open(mappings_path, 'rb') as f:
+            self.original_mappings = _loads(f.read())
+        
+        self._is_traditional = "mappings" in self.original_mappings
+        self._normalized_original = self._normalize(self.original_mappings)
         
         self._log_debug(f"Loaded mappings from {mappings_path} with {len(self.original_mappings)} entries")
     
+    @staticmethod
+    def _normalize(mappings: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+        """
+        Bring either mappings file format into a {file_path: {header: target_field}} dict.
+        
+        Args:
+            mappings: Parsed contents of a mappings file
+            
+        Returns:
+            Field mappings keyed by full file path
+        """
+        if "mappings" in mappings:
+            # Traditional format: {"mappings": {file_path: {header: target_field}}, "target_fields": [...]}
+            return mappings["mappings"]
+        
+        # AI format: {filename: {"_full_path": path, "mappings": {header: target_field}}}
+        normalized = {}
+        for filename, file_data in mappings.items():
+            if isinstance(file_data, dict) and "mappings" in file_data:
+                full_path = file_data.get("_full_path", filename)
+                normalized[full_path] = file_data["mappings"]
+        return normalized
+    
     async def validate_and_correct_mappings(self) -> None:
         """
         Validate and correct all mappings using AI in a single request.
         """
         if not self._session:
-            self._session = aiohttp.ClientSession()
+            self._session = self._create_session()
         
-        # Prepare the mappings for validation
-        # Handle both AI and traditional mapping formats
-        mappings_to_validate = {}
-        
-        if "mappings" in self.original_mappings:
-            # Traditional format: {"mappings": {file_path: {header: target_field}}, "target_fields": [...]}
-            mappings_to_validate = self.original_mappings["mappings"]
-        else:
-            # AI format: {filename: {"_full_path": path, "mappings": {header: target_field}}}
-            for filename, file_data in self.original_mappings.items():
-                if isinstance(file_data, dict) and "mappings" in file_data:
-                    full_path = file_data.get("_full_path", filename)
-                    mappings_to_validate[full_path] = file_data["mappings"]
+        # Both input formats were normalized to {file_path: mappings} on load
+        mappings_to_validate = self._normalized_original
         
         # self._log_debug(f"Extracted {len(mappings_to_validate)} files to validate")
         
@@ -112,9 +232,9 @@ class AIMappingValidator:
             self.corrected_mappings = await self._validate_all_mappings(mappings_to_validate)
             self._log_debug(f"Validation completed. Got {len(self.corrected_mappings)} corrected files")
             
-            # Add diff to debug log
-            diff_summary = self._generate_diff_summary()
-            self._log_debug("MAPPING CHANGES SUMMARY", diff_summary)
+            # Add diff to debug log; the summary walks every mapping, so only build it when logging
+            if self.debug:
+                self._log_debug("MAPPING CHANGES SUMMARY", self._generate_diff_summary())
             
         except Exception as e:
             error_msg = f"Error validating mappings: {str(e)}"
@@ -138,27 +258,55 @@ class AIMappingValidator:
         
         # self._log_debug(f"Processing {len(all_mappings)} files in {len(batches)} batches of up to {batch_size} files each")
         
+        # Send the batches concurrently, bounded by a semaphore, and advance the
+        # progress bar as each one finishes
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
+        tasks = [
+            asyncio.ensure_future(self._run_batch(semaphore, dict(batch), batch_idx + 1))
+            for batch_idx, batch in enumerate(batches)
+        ]
+        
+        pbar = tqdm(total=len(tasks), desc="Validating batches")
+        try:
+            for future in asyncio.as_completed(tasks):
+                await future
+                pbar.update(1)
+        finally:
+            pbar.close()
+        
+        # Merge in batch order so the output does not depend on timing
         corrected_mappings = {}
+        for task in tasks:
+            corrected_mappings.update(task.result())
+        
+        self._log_debug(f"All batches processed. Final result: {len(corrected_mappings)} files")
+        return corrected_mappings
+    
+    async def _run_batch(self, semaphore: asyncio.Semaphore, batch_mappings: Dict[str, Dict[str, str]],
+                         batch_num: int) -> Dict[str, Dict[str, str]]:
+        """
+        Validate one batch once a concurrency slot is free.
         
-        # Process each batch
-        for batch_idx, batch in enumerate(batches):
-            batch_mappings = dict(batch)
-            print(f"Processing batch {batch_idx + 1}/{len(batches)} ({len(batch_mappings)} files)...")
+        Args:
+            semaphore: Semaphore bounding the number of batches in flight
+            batch_mappings: Dictionary of file paths to mappings for this batch
+            batch_num: Batch number for logging
             
+        Returns:
+            Corrected mappings for this batch, or the original ones if it failed
+        """
+        async with semaphore:
             try:
-                batch_corrected = await self._validate_mapping_batch(batch_mappings, batch_idx + 1)
-                corrected_mappings.update(batch_corrected)
-                self._log_debug(f"Batch {batch_idx + 1} completed successfully with {len(batch_corrected)} files")
+                batch_corrected = await self._validate_mapping_batch(batch_mappings, batch_num)
+                self._log_debug(f"Batch {batch_num} completed successfully with {len(batch_corrected)} files")
+                return batch_corrected
             except Exception as e:
-                error_msg = f"Error processing batch {batch_idx + 1}: {str(e)}"
+                error_msg = f"Error processing batch {batch_num}: {str(e)}"
                 print(f"Warning: {error_msg}, keeping original mappings for this batch")
                 self._log_debug(f"BATCH ERROR: {error_msg}")
                 
                 # Keep original mappings for this batch
-                corrected_mappings.update(batch_mappings)
-        
-        self._log_debug(f"All batches processed. Final result: {len(corrected_mappings)} files")
-        return corrected_mappings
+                return batch_mappings
     
     async def _validate_mapping_batch(self, batch_mappings: Dict[str, Dict[str, str]], batch_num: int) -> Dict[str, Dict[str, str]]:
         """
@@ -178,14 +326,20 @@ class AIMappingValidator:
             self._log_debug(f"ERROR: {error_msg}")
             return batch_mappings  # Return original mappings if no API key
         
-        # Prepare the mappings data for the prompt
+        # Prepare the mappings data for the prompt, and index the full paths by
+        # basename so the answer can be mapped back without rescanning the batch
         mappings_for_prompt = {}
+        basename_to_path = {}
         for file_path, file_mappings in batch_mappings.items():
             filename = os.path.basename(file_path)
             mappings_for_prompt[filename] = file_mappings
+            basename_to_path.setdefault(filename, file_path)
         
         # self._log_debug(f"Batch {batch_num}: prepared {len(mappings_for_prompt)} files for AI validation")
         
+        # Compact JSON: indentation only adds input tokens to every batch
+        prompt_mappings = _dumps_bytes(mappings_for_prompt).decode('utf-8')
+        
         # Prepare the prompt for validation
         user_description = f"\n\nUser description of relevant data: {self.data_description}" if self.data_description else ""
         
@@ -194,7 +348,7 @@ class AIMappingValidator:
 Target fields available: {", ".join(self.target_fields)}{user_description}
 
 Current mappings for batch {batch_num}:
-{json.dumps(mappings_for_prompt, indent=2)}
+{prompt_mappings}
 
 Task: Return the corrected mappings for all files as a JSON object. Only include mappings that make logical sense and use the available target fields. Remove any incorrect mappings. Keep the same file structure.
 
@@ -237,20 +391,19 @@ JSON response:
                 json=data
             ) as response:
                 response.raise_for_status()
-                result = await response.json()
+                result = await response.json(loads=_loads)
                 content = result['choices'][0]['message']['content']
             
             # self._log_debug(f"Batch {batch_num}: received AI response")
             
             # Try to parse the JSON object from the response
             try:
-                # First, try to find JSON object in the response if it's not a clean JSON
-                import re
-                json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                if json_match:
-                    content = json_match.group(0)
-                
-                corrected_mappings_by_filename = json.loads(content)
+                # Decode from the first '{' so any prose around the JSON is ignored
+                start = content.find('{')
+                if start < 0:
+                    corrected_mappings_by_filename = _loads(content)
+                else:
+                    corrected_mappings_by_filename = _JSON_DECODER.raw_decode(content, start)[0]
                 
                 # self._log_debug(f"Batch {batch_num}: successfully parsed JSON response with {len(corrected_mappings_by_filename)} files")
                 
@@ -258,11 +411,7 @@ JSON response:
                 corrected_mappings = {}
                 for filename, file_mappings in corrected_mappings_by_filename.items():
                     # Find the original full path for this filename
-                    full_path = None
-                    for original_path in batch_mappings.keys():
-                        if os.path.basename(original_path) == filename:
-                            full_path = original_path
-                            break
+                    full_path = basename_to_path.get(filename)
                     
                     if not full_path:
                         warning_msg = f"Could not find original path for {filename} in batch {batch_num}, skipping"
@@ -270,15 +419,21 @@ JSON response:
                         self._log_debug(f"WARNING: {warning_msg}")
                         continue
                     
-                    # Validate that mappings only use allowed target fields
+                    # Validate that mappings only use allowed target fields, collecting
+                    # the rejected ones so each file is reported once
                     validated_mappings = {}
+                    invalid = []
                     for source, target in file_mappings.items():
-                        if target in self.target_fields:
+                        if isinstance(target, str) and target in self._target_set:
                             validated_mappings[source] = target
                         else:
-                            warning_msg = f"Target field '{target}' not in allowed target fields, skipping mapping for '{source}' in {filename} (batch {batch_num})"
-                            print(f"Warning: {warning_msg}")
-                            self._log_debug(f"WARNING: Invalid target field '{target}' for '{source}' in {filename}")
+                            invalid.append(f"'{source}' -> '{target}'")
+                    
+                    if invalid:
+                        invalid_list = ", ".join(invalid)
+                        print(f"Warning: Skipping {len(invalid)} mapping(s) in {filename} (batch {batch_num}) "
+                              f"with targets not in allowed target fields: {invalid_list}")
+                        self._log_debug(f"WARNING: Invalid target fields in {filename}: {invalid_list}")
                     
                     if validated_mappings:
                         corrected_mappings[full_path] = validated_mappings
@@ -304,15 +459,16 @@ JSON response:
             # Return original mappings for this batch
             return batch_mappings
     
-    def save_corrected_mappings(self, output_path: str) -> None:
+    def save_corrected_mappings(self, output_path: str, pretty: bool = False) -> None:
         """
         Save the corrected mappings to a JSON file in the same format as the original.
         
         Args:
             output_path: Path to save the corrected mappings file
+            pretty: Indent the JSON for reading; compact output is written by default
         """
-        # Determine the original format and maintain it
-        if "mappings" in self.original_mappings:
+        # Keep the format the mappings were loaded in
+        if self._is_traditional:
             # Traditional format: {"mappings": {file_path: {header: target_field}}, "target_fields": [...]}
             output_data = {
                 "target_fields": self.target_fields,
@@ -334,8 +490,9 @@ JSON response:
                         "mappings": mappings
                     }
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, indent=2)
+        # Encode the whole document up front and hand it to the file in one write
+        with open(output_path, 'wb') as f:
+            f.write(_dumps_bytes(output_data, pretty))
     
     def get_changes_diff(self) -> List[Dict[str, Any]]:
         """
@@ -346,52 +503,42 @@ JSON response:
         """
         changes = []
         
-        # Get original mappings in consistent format
-        original_mappings = {}
-        if "mappings" in self.original_mappings:
-            original_mappings = self.original_mappings["mappings"]
-        else:
-            for filename, file_data in self.original_mappings.items():
-                if isinstance(file_data, dict) and "mappings" in file_data:
-                    full_path = file_data.get("_full_path", filename)
-                    original_mappings[full_path] = file_data["mappings"]
+        # Original mappings in the consistent format computed on load
+        original_mappings = self._normalized_original
         
         # Compare original vs corrected
-        all_files = set(original_mappings.keys()) | set(self.corrected_mappings.keys())
+        all_files = original_mappings.keys() | self.corrected_mappings.keys()
         
         for file_path in all_files:
             original = original_mappings.get(file_path, {})
             corrected = self.corrected_mappings.get(file_path, {})
             
-            file_changes = {
-                "file": os.path.basename(file_path),
-                "full_path": file_path,
-                "added": {},
-                "removed": {},
-                "changed": {},
-                "unchanged": {}
-            }
-            
-            # Find added, removed, and changed mappings
-            all_keys = set(original.keys()) | set(corrected.keys())
-            
-            for key in all_keys:
-                if key in original and key in corrected:
-                    if original[key] != corrected[key]:
-                        file_changes["changed"][key] = {
-                            "from": original[key],
-                            "to": corrected[key]
-                        }
-                    else:
-                        file_changes["unchanged"][key] = corrected[key]
-                elif key in corrected:
-                    file_changes["added"][key] = corrected[key]
-                elif key in original:
-                    file_changes["removed"][key] = original[key]
+            # Find added, removed, and changed mappings with set operations on the key views
+            original_keys = original.keys()
+            corrected_keys = corrected.keys()
+            added = {key: corrected[key] for key in corrected_keys - original_keys}
+            removed = {key: original[key] for key in original_keys - corrected_keys}
+            changed = {}
+            unchanged = {}
+            for key in corrected_keys & original_keys:
+                if original[key] != corrected[key]:
+                    changed[key] = {
+                        "from": original[key],
+                        "to": corrected[key]
+                    }
+                else:
+                    unchanged[key] = corrected[key]
             
             # Only include files that have changes
-            if file_changes["added"] or file_changes["removed"] or file_changes["changed"]:
-                changes.append(file_changes)
+            if added or removed or changed:
+                changes.append({
+                    "file": os.path.basename(file_path),
+                    "full_path": file_path,
+                    "added": added,
+                    "removed": removed,
+                    "changed": changed,
+                    "unchanged": unchanged
+                })
         
         return changes
 
@@ -402,28 +549,32 @@ JSON response:
         if not changes:
             return {"message": "No changes were made to the mappings"}
         
-        summary = {
-            "files_with_changes": len(changes),
-            "total_added": sum(len(f["added"]) for f in changes),
-            "total_removed": sum(len(f["removed"]) for f in changes),
-            "total_changed": sum(len(f["changed"]) for f in changes),
-            "detailed_changes": []
-        }
-        
+        # Totals and per-file details in a single pass over the changes
+        total_added = total_removed = total_changed = 0
+        detailed_changes = []
         for file_change in changes:
-            file_detail = {
+            total_added += len(file_change["added"])
+            total_removed += len(file_change["removed"])
+            total_changed += len(file_change["changed"])
+            detailed_changes.append({
                 "file": file_change["file"],
                 "added": file_change["added"],
-                "removed": file_change["removed"], 
+                "removed": file_change["removed"],
                 "changed": file_change["changed"],
                 "unchanged_count": len(file_change["unchanged"])
-            }
-            summary["detailed_changes"].append(file_detail)
-            
-        return summary
+            })
+        
+        return {
+            "files_with_changes": len(changes),
+            "total_added": total_added,
+            "total_removed": total_removed,
+            "total_changed": total_changed,
+            "detailed_changes": detailed_changes
+        }
 
 
-async def validate_mappings_with_ai(mappings_path: str, target_fields: List[str], data_description: str = "") -> AIMappingValidator:
+async def validate_mappings_with_ai(mappings_path: str, target_fields: List[str], data_description: str = "",
+                                    debug_log_path: Optional[str] = None) -> AIMappingValidator:
     """
     Validate and correct existing field mappings using AI.
     
@@ -431,11 +582,12 @@ async def validate_mappings_with_ai(mappings_path: str, target_fields: List[str]
         mappings_path: Path to the existing mappings.json file
         target_fields: List of target fields that mappings should map to
         data_description: User-provided description of the data they care about
+        debug_log_path: If set, stream the debug log to this file while validating
         
     Returns:
         AIMappingValidator instance with validation results
     """
-    async with AIMappingValidator(target_fields, data_description) as validator:
+    async with AIMappingValidator(target_fields, data_description, debug_log_path=debug_log_path) as validator:
         validator.load_mappings(mappings_path)
         await validator.validate_and_correct_mappings()
         return validator
@@ -462,40 +614,45 @@ def format_changes_diff(validator: AIMappingValidator) -> str:
         ""
     ]
     
+    # Bind the list methods once for the loop below
+    append = lines.append
+    extend = lines.extend
+    
+    # Summary totals are accumulated while the files are formatted
+    total_added = total_removed = total_changed = 0
+    
     for file_change in changes:
-        lines.append(f"File: {file_change['file']}")
-        lines.append("-" * 30)
+        total_added += len(file_change["added"])
+        total_removed += len(file_change["removed"])
+        total_changed += len(file_change["changed"])
+        
+        append(f"File: {file_change['file']}")
+        append("-" * 30)
         
         # Added mappings
         if file_change["added"]:
-            lines.append("  Added:")
-            for key, value in file_change["added"].items():
-                lines.append(f"    + {key} → {value}")
+            append("  Added:")
+            extend(f"    + {key} → {value}" for key, value in file_change["added"].items())
         
         # Removed mappings
         if file_change["removed"]:
-            lines.append("  Removed:")
-            for key, value in file_change["removed"].items():
-                lines.append(f"    - {key} → {value}")
+            append("  Removed:")
+            extend(f"    - {key} → {value}" for key, value in file_change["removed"].items())
         
         # Changed mappings
         if file_change["changed"]:
-            lines.append("  Changed:")
-            for key, change in file_change["changed"].items():
-                lines.append(f"    ~ {key}: {change['from']} → {change['to']}")
+            append("  Changed:")
+            extend(f"    ~ {key}: {change['from']} → {change['to']}" for key, change in file_change["changed"].items())
         
         # Unchanged count
         unchanged_count = len(file_change["unchanged"])
         if unchanged_count > 0:
-            lines.append(f"  Unchanged: {unchanged_count} mappings")
+            append(f"  Unchanged: {unchanged_count} mappings")
         
-        lines.append("")
+        append("")
     
     # Summary
     total_files = len(changes)
-    total_added = sum(len(f["added"]) for f in changes)
-    total_removed = sum(len(f["removed"]) for f in changes)
-    total_changed = sum(len(f["changed"]) for f in changes)
     
     lines.extend([
         "Summary:",
@@ -6,19 +6,25 @@ A tool to extract and normalize headers from various data files (CSV, JSON, SQL,
 import argparse
 import os
 import sys
+import stat
 import json
 import asyncio
+import collections
 import concurrent.futures
-from typing import Dict, List, Set, Tuple, Any
+import contextlib
+import itertools
+from typing import Dict, Iterable, Iterator, List, Set, Tuple, Any
 from tqdm import tqdm
 import time
 
 from src.header_extractors import extract_headers_from_file
-from src.field_utilities import analyze_field_variations, group_fields
-from src.field_mapper import create_field_mappings, format_mappings_report, DEFAULT_TARGET_FIELDS, FieldMapper
-from src.ai_field_mapper import create_ai_field_mappings, format_ai_mappings_report, AIFieldMapper
+from src.field_utilities import analyze_field_variations
+from src.field_mapper import create_field_mappings, DEFAULT_TARGET_FIELDS, FieldMapper
+from src.ai_field_mapper import create_ai_field_mappings, AIFieldMapper, DEFAULT_BATCH_SIZE
 from src.ai_mapping_validator import validate_mappings_with_ai, format_changes_diff, AIMappingValidator
 from src.data_extractor import extract_all_data, write_jsonl, write_data
+from src.header_cache import (load_header_cache, save_header_cache, prune_header_cache, file_signature,
+                              get_cached_headers, put_cached_headers)
 
 
 def load_config(config_file: str) -> Dict[str, Any]:
@@ -40,6 +46,22 @@ def load_config(config_file: str) -> Dict[str, Any]:
         sys.exit(1)
 
 
+def normalize_file_type(file_type: str) -> str:
+    """Normalize a file type to a lowercase extension without the leading dot (".CSV" -> "csv")."""
+    return file_type.lower().lstrip('.')
+
+
+def positive_int(value: str) -> int:
+    """Parse a command line value that must be an integer of at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
 def parse_args():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(
@@ -68,6 +90,7 @@ def parse_args():
     analyze_parser.add_argument(
         "--file-types",
         nargs="+",
+        type=normalize_file_type,
         default=["csv", "json", "jsonl"],
         help="File types to process (default: csv json, optional: txt, sql)",
     )
@@ -110,6 +133,22 @@ def parse_args():
         "--data-description",
         help="Description of the data you are looking for (helps AI determine file relevance)",
     )
+    analyze_parser.add_argument(
+        "--ai-batch-size",
+        type=positive_int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Number of files described in one AI request (default: {DEFAULT_BATCH_SIZE})",
+    )
+    analyze_parser.add_argument(
+        "--workers",
+        type=positive_int,
+        help="Number of processes used to extract headers (default: one per CPU)",
+    )
+    analyze_parser.add_argument(
+        "--no-header-cache",
+        action="store_true",
+        help="Parse every file again instead of reusing headers cached for unchanged files",
+    )
     
     # 2. Extract command - for extracting data using mappings
     extract_parser = subparsers.add_parser(
@@ -195,6 +234,7 @@ def parse_args():
     process_parser.add_argument(
         "--file-types",
         nargs="+",
+        type=normalize_file_type,
         default=["csv", "json"],
         help="File types to process (default: csv json, optional: txt, sql)",
     )
@@ -254,6 +294,12 @@ def parse_args():
         "--data-description",
         help="Description of the data you are looking for (helps AI determine file relevance)",
     )
+    process_parser.add_argument(
+        "--ai-batch-size",
+        type=positive_int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Number of files described in one AI request (default: {DEFAULT_BATCH_SIZE})",
+    )
     process_parser.add_argument(
         "--output-format",
         choices=["jsonl", "csv", "json"],
@@ -265,28 +311,104 @@ def parse_args():
         action="store_true",
         help="Include source file information in the output (disabled by default)",
     )
+    process_parser.add_argument(
+        "--workers",
+        type=positive_int,
+        help="Number of processes used to extract headers (default: one per CPU)",
+    )
+    process_parser.add_argument(
+        "--no-header-cache",
+        action="store_true",
+        help="Parse every file again instead of reusing headers cached for unchanged files",
+    )
     
     return parser.parse_args()
 
 
-# Helper function for directory processing - must be at module level for pickability
-def process_directory(directory, file_types, max_files):
-    dir_files = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if any(file.endswith(f".{ext}") for ext in file_types):
-                dir_files.append(os.path.join(root, file))
+# Most files handed to one header-extraction worker task
+EXTRACT_BATCH_SIZE = 16
+
+# Write buffer for the analysis report file
+REPORT_BUFFER_SIZE = 1 << 20
+
+# Threads used to scan the subdirectories of one tree concurrently
+SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+def scan_directory(directory, suffixes):
+    """
+    List a single directory level the way os.walk does.
     
-    # Limit the number of files from this directory if max_files is specified
-    if max_files is not None and max_files > 0:
-        dir_files = dir_files[:max_files]
+    Args:
+        directory: Directory to list
+        suffixes: Tuple of lowercase ".ext" suffixes to include
         
-    return dir_files
+    Returns:
+        Tuple of (matching file paths, subdirectory paths to descend into)
+    """
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    # Like os.walk, list symlinked directories but do not follow them
+                    if not entry.is_symlink():
+                        subdirs.append(entry.path)
+                elif entry.name.lower().endswith(suffixes):
+                    # DirEntry.path is already joined with the directory
+                    files.append(entry.path)
+    except OSError:
+        # os.walk skips directories it cannot read as well
+        pass
+    return files, subdirs
 
 
-def find_data_files(paths: List[str], file_types: List[str], max_files: int = None) -> List[str]:
+def iter_directory_files(directory: str, suffixes: Tuple[str, ...]) -> Iterator[str]:
     """
-    Find all data files with the specified extensions in the given paths using parallel processing.
+    Yield the matching files under a directory in os.walk's top-down order.
+    
+    Args:
+        directory: Directory to search
+        suffixes: Tuple of lowercase ".ext" suffixes to include
+        
+    Yields:
+        Paths of matching files
+    """
+    # Each discovered subdirectory is scanned as its own task. Matches are
+    # yielded as soon as the listings ahead of them are in, so the caller can
+    # start on them while the rest of the tree is scanned
+    listings = {}
+    stack = [directory]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+        pending = {executor.submit(scan_directory, directory, suffixes): directory}
+        try:
+            while pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    scanned = pending.pop(future)
+                    files, subdirs = future.result()
+                    listings[scanned] = (files, subdirs)
+                    for subdir in subdirs:
+                        pending[executor.submit(scan_directory, subdir, suffixes)] = subdir
+                
+                while stack and stack[-1] in listings:
+                    files, subdirs = listings.pop(stack.pop())
+                    yield from files
+                    stack.extend(reversed(subdirs))
+        finally:
+            # When the caller stops early, drop the scans that have not started
+            for future in pending:
+                future.cancel()
+
+
+def iter_data_files(paths: List[str], file_types: List[str], max_files: int = None) -> Iterator[str]:
+    """
+    Yield the data files with the specified extensions in the given paths as they are found.
     Paths can be directories or individual files.
     
     Args:
@@ -294,49 +416,73 @@ def find_data_files(paths: List[str], file_types: List[str], max_files: int = No
         file_types: List of file extensions to include
         max_files: Maximum number of files to process (only applies to directories)
         
-    Returns:
-        List of absolute paths to matching data files
+    Yields:
+        Paths to matching data files, individual files first
     """
-    data_files = []
     directories = []
     
+    # Lowercase ".ext" suffixes, built once and matched case-insensitively
+    suffixes = tuple(f".{normalize_file_type(ext)}" for ext in file_types)
+    
     # First separate directories from individual files
     for path in paths:
+        # One stat per path answers both the directory and the file check
+        try:
+            mode = os.stat(path).st_mode
+        except (OSError, ValueError):
+            mode = 0
+        
         # Check if the path is a directory
-        if os.path.isdir(path):
+        if stat.S_ISDIR(mode):
             directories.append(path)
         # Check if the path is a file
-        elif os.path.isfile(path):
-            _, ext = os.path.splitext(path)
-            ext = ext.lower().lstrip('.')
-            
-            if ext in file_types:
-                data_files.append(path)
+        elif stat.S_ISREG(mode):
+            if path.lower().endswith(suffixes):
+                yield path
             else:
                 print(f"Warning: {path} is not a supported file type ({', '.join(file_types)}), skipping.", file=sys.stderr)
         # Path is neither a file nor a directory
         else:
             print(f"Warning: {path} is not a valid file or directory, skipping.", file=sys.stderr)
     
-    # Process directories in parallel if there are more than one
-    if directories:
-        # Use parallel processing for multiple directories
-        if len(directories) > 1:
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                futures = [executor.submit(process_directory, directory, file_types, max_files) 
-                          for directory in directories]
-                for future in tqdm(concurrent.futures.as_completed(futures), 
-                                  total=len(futures), 
-                                  desc="Scanning directories", 
-                                  unit="dir"):
-                    dir_files = future.result()
-                    data_files.extend(dir_files)
-        else:
-            # Just process a single directory directly
-            dir_files = process_directory(directories[0], file_types, max_files)
-            data_files.extend(dir_files)
-            
-    return data_files
+    # Each directory tree is scanned by its own pool of threads. With max_files
+    # set, the scan is closed as soon as enough files were taken from it
+    limit = max_files if max_files is not None and max_files > 0 else None
+    for directory in directories:
+        with contextlib.closing(iter_directory_files(directory, suffixes)) as dir_files:
+            yield from itertools.islice(dir_files, limit)
+
+
+def find_data_files(paths: List[str], file_types: List[str], max_files: int = None) -> List[str]:
+    """
+    Find all data files with the specified extensions in the given paths using parallel processing.
+    Paths can be directories or individual files.
+    
+    Args:
+        paths: List of directory or file paths to process
+        file_types: List of file extensions to include
+        max_files: Maximum number of files to process (only applies to directories)
+        
+    Returns:
+        List of absolute paths to matching data files
+    """
+    return list(iter_data_files(paths, file_types, max_files))
+
+
+def collect_into(items: Iterable[Any], collected: List[Any]) -> Iterator[Any]:
+    """
+    Pass items through while recording them, so a stream can be consumed and kept.
+    
+    Args:
+        items: Items to pass through
+        collected: List each item is appended to as it passes
+        
+    Yields:
+        The items, unchanged
+    """
+    for item in items:
+        collected.append(item)
+        yield item
 
 
 # Helper function for parallel processing - must be at module level for pickability
@@ -349,45 +495,80 @@ def extract_headers_worker(file_path):
         return (file_path, [], False, str(e))
 
 
-def process_files(file_paths: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]], List[str]]:
+def extract_headers_batch(file_paths):
+    """Run extract_headers_worker over several files in one worker task."""
+    return [extract_headers_worker(file_path) for file_path in file_paths]
+
+
+def process_files(file_paths: Iterable[str], use_cache: bool = True,
+                  workers: int = None) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]], List[str]]:
     """
     Process all files and extract headers using parallel processing.
     
     Args:
-        file_paths: List of file paths to process
+        file_paths: File paths to process; may be a stream still being produced
+            (e.g. iter_data_files), in which case parsing overlaps the search
+        use_cache: Reuse headers cached for files whose mtime and size are unchanged
+        workers: Number of worker processes (default: one per CPU)
         
     Returns:
         Tuple of (header_stats, file_metadata, all_headers)
     """
-    header_stats = {}
+    # Per-header counts and source files are kept in two flat containers while
+    # the files come in and combined into header_stats at the end
+    header_counts = collections.Counter()
+    header_files = collections.defaultdict(list)
     file_metadata = []
     all_headers = []
-    failed_files = {}
     
-    # Process files in parallel
-    with concurrent.futures.ProcessPoolExecutor() as executor:
-        # Submit all tasks
-        futures = [executor.submit(extract_headers_worker, file_path) for file_path in file_paths]
+    cache = load_header_cache() if use_cache else {}
+    workers = workers or os.cpu_count() or 1
+    entries = []
+    batches = []
+    batch = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        # Submit files to the workers as the paths arrive. Only files that
+        # changed since they were last parsed need extracting. Tasks grow from
+        # single files up to EXTRACT_BATCH_SIZE as more paths come in, so small
+        # runs still spread across the workers while large ones amortize the
+        # inter-process round trips
+        for file_path in tqdm(file_paths, desc="Finding files", unit="file"):
+            signature = file_signature(file_path) if use_cache else None
+            hit = get_cached_headers(cache, file_path, signature)
+            entries.append((file_path, signature, hit))
+            if hit is None:
+                batch.append(file_path)
+                if len(batch) >= min(EXTRACT_BATCH_SIZE, max(1, len(entries) // (workers * 4))):
+                    batches.append(executor.submit(extract_headers_batch, batch))
+                    batch = []
+        if batch:
+            batches.append(executor.submit(extract_headers_batch, batch))
         
-        # Process results as they complete
-        for future in tqdm(concurrent.futures.as_completed(futures), total=len(futures), 
-                          desc="Processing files", unit="file"):
-            file_path, headers, headers_inferred, error = future.result()
+        # Extraction results arrive in input order, interleaved here with the cache hits
+        extracted = (result for future in batches for result in future.result())
+        for file_path, signature, hit in tqdm(entries, desc="Processing files", unit="file"):
+            if hit is not None:
+                headers, headers_inferred = hit
+                error = None
+            else:
+                _, headers, headers_inferred, error = next(extracted)
+                if use_cache and not error:
+                    put_cached_headers(cache, file_path, signature, headers, headers_inferred)
             
             if error:
-                failed_files[file_path] = error
                 print(f"Error processing {file_path}: {error}", file=sys.stderr)
                 continue
             
+            # Intern the names so every list that references them shares one
+            # string object; headers coming back from the workers or the cache
+            # are separate copies for every file otherwise
+            headers = [sys.intern(header) for header in headers]
+            file_name = sys.intern(os.path.basename(file_path))
+            
             # Update header statistics
+            header_counts.update(headers)
             for header in headers:
-                if header not in header_stats:
-                    header_stats[header] = {
-                        "count": 0,
-                        "files": []
-                    }
-                header_stats[header]["count"] += 1
-                header_stats[header]["files"].append(os.path.basename(file_path))
+                header_files[header].append(file_name)
             
             # Add to file metadata
             file_metadata.append({
@@ -399,12 +580,68 @@ def process_files(file_paths: List[str]) -> Tuple[Dict[str, Dict[str, Any]], Lis
             # Add to all headers list
             all_headers.extend(headers)
     
+    if use_cache and batches:
+        # Only rewrite the cache when something new was parsed, dropping the
+        # entries of files deleted since they were cached
+        save_header_cache(prune_header_cache(cache))
+    
+    header_stats = {
+        header: {
+            "count": header_counts[header],
+            "files": files
+        }
+        for header, files in header_files.items()
+    }
+    
     # Remove duplicates from all_headers
     all_headers = list(set(all_headers))
     
     return header_stats, file_metadata, all_headers
 
 
+def summarize_analyzed_files(data_files: List[str], file_mappings: Dict[str, Dict[str, str]],
+                             file_metadata: List[Dict[str, Any]]) -> List[str]:
+    """
+    Build the "name: mapped/total fields" line shown for each analyzed file in the report.
+    
+    Args:
+        data_files: Paths of the analyzed files
+        file_mappings: Dictionary mapping file paths to their field mappings
+        file_metadata: File metadata returned by process_files
+        
+    Returns:
+        One report line per data file
+    """
+    # Index the mappings by basename once; the first mapping with a name wins
+    mappings_by_name = {}
+    for k, mapping in file_mappings.items():
+        mappings_by_name.setdefault(os.path.basename(k), mapping)
+    
+    # Index the header totals once instead of scanning file_metadata for every file
+    headers_by_path = {}
+    headers_by_name = {}
+    for meta in file_metadata:
+        path = meta.get('path', '')
+        total = len(meta.get('headers', []))
+        headers_by_path.setdefault(path, total)
+        headers_by_name.setdefault(os.path.basename(path), total)
+    
+    lines = []
+    for file_path in data_files:
+        file_name = os.path.basename(file_path)
+        # Try to match mapping by full path, fallback to basename
+        mapping = file_mappings.get(file_path)
+        if mapping is None:
+            mapping = mappings_by_name.get(file_name)
+        count = len(mapping) if mapping else 0
+        # Total headers for this file, by full path or else by basename
+        total_headers = headers_by_path.get(file_path)
+        if total_headers is None:
+            total_headers = headers_by_name.get(file_name, 0)
+        lines.append(f"{file_name}: {count}/{total_headers} fields")
+    return lines
+
+
 async def async_main():
     """Async main entry point for the CLI."""
     args = parse_args()
@@ -422,20 +659,20 @@ async def async_main():
     if args.command == "analyze":
         start_time = time.time()
         
-        # Find data files
-        data_files = find_data_files(args.paths, args.file_types, args.max_files)
+        # Find data files and extract their headers, starting on each file as
+        # soon as it is found instead of after the whole search
+        data_files = []
+        header_stats, file_metadata, all_headers = process_files(
+            collect_into(iter_data_files(args.paths, args.file_types, args.max_files), data_files),
+            use_cache=not args.no_header_cache,
+            workers=args.workers
+        )
         if not data_files:
             print("Error: No matching data files found.", file=sys.stderr)
             sys.exit(1)
         
         print(f"Found {len(data_files)} data files to analyze.")
         
-        # Process files to extract headers
-        header_stats, file_metadata, all_headers = process_files(data_files)
-        
-        # Group fields by type
-        field_groups = group_fields(all_headers)
-        
         # Get target fields and data description from config or command line
         target_fields = args.target_fields or config.get('target_fields') or DEFAULT_TARGET_FIELDS
         data_description = args.data_description or config.get('data_description', "")
@@ -446,8 +683,8 @@ async def async_main():
             print(f"Using AI to create field mappings with target fields: {', '.join(target_fields)}")
             if data_description:
                 print(f"Using data description: \"{data_description}\"")
-            mapper = await create_ai_field_mappings(file_metadata, target_fields, data_description)
-            mappings_report = format_ai_mappings_report(mapper)
+            mapper = await create_ai_field_mappings(file_metadata, target_fields, data_description,
+                                                    batch_size=args.ai_batch_size)
         else:
             # Use traditional regex-based field mapping
             print(f"Creating field mappings with target fields: {', '.join(target_fields)}")
@@ -456,7 +693,6 @@ async def async_main():
                 mapper = create_field_mappings(file_metadata, target_fields, custom_patterns=config['field_patterns'])
             else:
                 mapper = create_field_mappings(file_metadata, target_fields)
-            mappings_report = format_mappings_report(mapper)
         
         # Save mappings to file
         mapper.save_mappings(args.mappings_output)
@@ -469,42 +705,24 @@ async def async_main():
         import datetime
         now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        # Build analyzed_files_str with field counts
-        file_mappings = mapper.get_all_mappings()
-        analyzed_files_lines = []
-        for file_path in data_files:
-            # Try to match mapping by full path, fallback to basename
-            mapping = file_mappings.get(file_path)
-            if mapping is None:
-                for k in file_mappings:
-                    if os.path.basename(k) == os.path.basename(file_path):
-                        mapping = file_mappings[k]
-                        break
-            count = len(mapping) if mapping else 0
-            # Find total headers for this file from file_metadata
-            total_headers = 0
-            for meta in file_metadata:
-                if meta.get('path') == file_path or os.path.basename(meta.get('path', '')) == os.path.basename(file_path):
-                    total_headers = len(meta.get('headers', []))
-                    break
-            analyzed_files_lines.append(f"{os.path.basename(file_path)}: {count}/{total_headers} fields")
-        
-        analyzed_files_str = "\n  - ".join(analyzed_files_lines)
+        # Build the per-file field counts for the report
+        analyzed_files_lines = summarize_analyzed_files(data_files, mapper.get_all_mappings(), file_metadata)
         
         # Generate analysis report
-        report = format_analysis_report(
+        report_args = dict(
             total_files=len(data_files),
             total_headers=len(all_headers),
-            analyzed_files=analyzed_files_str,
+            analyzed_files=analyzed_files_lines,
             datetime_str=now,
             processing_time=processing_time
         )
         if args.output:
-            with open(args.output, 'w', encoding='utf-8') as f:
-                f.write(report)
+            # Stream the report line by line instead of building it as one string
+            with open(args.output, 'w', encoding='utf-8', buffering=REPORT_BUFFER_SIZE) as f:
+                f.writelines(f"{line}\n" for line in iter_analysis_report(**report_args))
             print(f"Analysis report saved to {args.output}")
         else:
-            print(report)
+            print(format_analysis_report(**report_args))
     
     # Handle the extract command
     elif args.command == "extract":
@@ -584,9 +802,10 @@ async def async_main():
         
         # Validate and correct mappings using AI
         try:
-            validator = await validate_mappings_with_ai(args.mappings, target_fields, data_description)
+            validator = await validate_mappings_with_ai(args.mappings, target_fields, data_description,
+                                                        debug_log_path="validation_debug.log")
             
-            # Save debug log
+            # Finish the debug log (streamed while validating)
             validator.save_debug_log("validation_debug.log")
             print("Debug log saved to validation_debug.log")
             
@@ -600,16 +819,21 @@ async def async_main():
                 print("\nNo changes were made to the mappings.")
             else:
                 total_files = len(changes)
-                total_added = sum(len(f["added"]) for f in changes)
-                total_removed = sum(len(f["removed"]) for f in changes)
-                total_changed = sum(len(f["changed"]) for f in changes)
+                total_added = total_removed = total_changed = 0
+                for file_change in changes:
+                    total_added += len(file_change["added"])
+                    total_removed += len(file_change["removed"])
+                    total_changed += len(file_change["changed"])
                 
-                print(f"\nValidation completed:")
-                print(f"  Files with changes: {total_files}")
-                print(f"  Mappings added: {total_added}")
-                print(f"  Mappings removed: {total_removed}")
-                print(f"  Mappings changed: {total_changed}")
-                print(f"\nDetailed changes are available in validation_debug.log")
+                # Emit the summary as one write
+                print("\n".join([
+                    "\nValidation completed:",
+                    f"  Files with changes: {total_files}",
+                    f"  Mappings added: {total_added}",
+                    f"  Mappings removed: {total_removed}",
+                    f"  Mappings changed: {total_changed}",
+                    "\nDetailed changes are available in validation_debug.log"
+                ]))
             
         except Exception as e:
             print(f"Error during validation: {str(e)}", file=sys.stderr)
@@ -619,17 +843,20 @@ async def async_main():
     elif args.command == "process":
         start_time = time.time()
         
-        # Find data files
-        data_files = find_data_files(args.paths, args.file_types, args.max_files)
+        # Find data files and extract their headers, starting on each file as
+        # soon as it is found instead of after the whole search
+        data_files = []
+        header_stats, file_metadata, all_headers = process_files(
+            collect_into(iter_data_files(args.paths, args.file_types, args.max_files), data_files),
+            use_cache=not args.no_header_cache,
+            workers=args.workers
+        )
         if not data_files:
             print("Error: No matching data files found.", file=sys.stderr)
             sys.exit(1)
         
         print(f"Found {len(data_files)} data files to process.")
         
-        # Process files to extract headers
-        header_stats, file_metadata, all_headers = process_files(data_files)
-        
         # Create field mappings
         if args.use_ai:
             # Use AI-based field mapping with custom target fields
@@ -638,14 +865,13 @@ async def async_main():
             print(f"Using AI to create field mappings with target fields: {', '.join(target_fields)}")
             if data_description:
                 print(f"Using data description: \"{data_description}\"")
-            mapper = await create_ai_field_mappings(file_metadata, target_fields, data_description)
-            mappings_report = format_ai_mappings_report(mapper)
+            mapper = await create_ai_field_mappings(file_metadata, target_fields, data_description,
+                                                    batch_size=args.ai_batch_size)
         else:
             # Use traditional regex-based field mapping
             target_fields = args.target_fields or DEFAULT_TARGET_FIELDS
             print(f"Creating field mappings with target fields: {', '.join(target_fields)}")
             mapper = create_field_mappings(file_metadata, target_fields)
-            mappings_report = format_mappings_report(mapper)
         
         # Save mappings to file
         mapper.save_mappings(args.mappings_output)
@@ -658,38 +884,19 @@ async def async_main():
         import datetime
         now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        # Build analyzed_files_str with field counts
-        file_mappings = mapper.get_all_mappings()  # Dict[file_path, Dict[original_header, normalized_field]]
-        analyzed_files_lines = []
-        for file_path in data_files:
-            # Try to match mapping by full path, fallback to basename
-            mapping = file_mappings.get(file_path)
-            if mapping is None:
-                for k in file_mappings:
-                    if os.path.basename(k) == os.path.basename(file_path):
-                        mapping = file_mappings[k]
-                        break
-            count = len(mapping) if mapping else 0
-            # Find total headers for this file from file_metadata
-            total_headers = 0
-            for meta in file_metadata:
-                if meta.get('path') == file_path or os.path.basename(meta.get('path', '')) == os.path.basename(file_path):
-                    total_headers = len(meta.get('headers', []))
-                    break
-            analyzed_files_lines.append(f"{os.path.basename(file_path)}: {count}/{total_headers} fields")
-        
-        analyzed_files_str = "\n  - ".join(analyzed_files_lines)
+        # Build the per-file field counts for the report
+        analyzed_files_lines = summarize_analyzed_files(data_files, mapper.get_all_mappings(), file_metadata)
         
         if args.analysis_output:
-            report = format_analysis_report(
+            report_lines = iter_analysis_report(
                 total_files=len(data_files),
                 total_headers=len(all_headers),
-                analyzed_files=analyzed_files_str,
+                analyzed_files=analyzed_files_lines,
                 datetime_str=now,
                 processing_time=analysis_time
             )
-            with open(args.analysis_output, 'w', encoding='utf-8') as f:
-                f.write(report)
+            with open(args.analysis_output, 'w', encoding='utf-8', buffering=REPORT_BUFFER_SIZE) as f:
+                f.writelines(f"{line}\n" for line in report_lines)
             print(f"Analysis report saved to {args.analysis_output}")
 
         
@@ -711,121 +918,153 @@ async def async_main():
         print(f"Extracted {record_count} records to {extract_output_path}")
 
 
-def format_field_groups(field_groups: Dict[str, Set[str]], header_stats: Dict[str, Dict[str, Any]] = None) -> str:
+def iter_field_groups(field_groups: Dict[str, Set[str]], header_stats: Dict[str, Dict[str, Any]] = None) -> Iterator[str]:
     """
-    Format field groups for display.
+    Yield the lines of the field groups display.
     
     Args:
         field_groups: Dictionary mapping field types to sets of field names
         header_stats: Optional dictionary containing header statistics
         
-    Returns:
-        Formatted string representation of field groups
+    Yields:
+        Lines of the display (a chunk of plain field names may span several lines)
     """
-    lines = [
-        "Field Groups by Type",
-        "=" * 80,
-        ""
-    ]
+    yield "Field Groups by Type"
+    yield "=" * 80
+    yield ""
     
     for field_type, fields in sorted(field_groups.items()):
         if not fields:
             continue
             
-        lines.append(f"{field_type.upper()} FIELDS:")
-        lines.append("-" * 40)
+        yield f"{field_type.upper()} FIELDS:"
+        yield "-" * 40
         
         # Sort fields by frequency if header_stats is provided
         if header_stats:
             sorted_fields = sorted(fields, key=lambda x: header_stats.get(x, {}).get('count', 0), reverse=True)
+            for field in sorted_fields:
+                if field in header_stats:
+                    count = header_stats[field]['count']
+                    files = header_stats[field]['files']
+                    files_str = ", ".join(files[:3])
+                    if len(files) > 3:
+                        files_str += f" and {len(files) - 3} more"
+                    yield f"  {field} ({count} occurrences in {len(files)} files: {files_str})"
+                else:
+                    yield f"  {field}"
         else:
-            sorted_fields = sorted(fields)
-        
-        for field in sorted_fields:
-            if header_stats and field in header_stats:
-                count = header_stats[field]['count']
-                files = header_stats[field]['files']
-                files_str = ", ".join(files[:3])
-                if len(files) > 3:
-                    files_str += f" and {len(files) - 3} more"
-                lines.append(f"  {field} ({count} occurrences in {len(files)} files: {files_str})")
-            else:
-                lines.append(f"  {field}")
+            # Plain field names go out as one pre-joined chunk
+            yield "  " + "\n  ".join(sorted(fields))
         
-        lines.append("")
-    
-    return "\n".join(lines)
+        yield ""
 
 
-def format_field_variations(field_variations: Dict[str, Dict[str, Dict[str, List[str]]]], header_stats: Dict[str, Dict[str, Any]] = None) -> str:
+def format_field_groups(field_groups: Dict[str, Set[str]], header_stats: Dict[str, Dict[str, Any]] = None) -> str:
     """
-    Format field variations for display.
+    Format field groups for display.
     
     Args:
-        field_variations: Dictionary mapping field types to dictionaries of patterns and matching fields
+        field_groups: Dictionary mapping field types to sets of field names
         header_stats: Optional dictionary containing header statistics
         
     Returns:
-        Formatted string representation of field variations
+        Formatted string representation of field groups
     """
-    lines = [
-        "Field Variations by Type",
-        "=" * 80,
-        ""
-    ]
+    return "\n".join(iter_field_groups(field_groups, header_stats))
+
+
+def iter_field_variations(field_variations: Dict[str, Dict[str, Dict[str, List[str]]]], header_stats: Dict[str, Dict[str, Any]] = None) -> Iterator[str]:
+    """
+    Yield the lines of the field variations display.
+    
+    Args:
+        field_variations: Dictionary mapping field types to dictionaries of patterns and matching fields,
+            as returned by analyze_field_variations (fields with sources are listed in their given order)
+        header_stats: Optional dictionary containing header statistics
+        
+    Yields:
+        Lines of the display (a chunk of plain field names may span several lines)
+    """
+    yield "Field Variations by Type"
+    yield "=" * 80
+    yield ""
     
     for field_type, patterns in sorted(field_variations.items()):
-        lines.append(f"{field_type.upper()} FIELDS:")
-        lines.append("-" * 40)
+        yield f"{field_type.upper()} FIELDS:"
+        yield "-" * 40
         
         for pattern, fields in sorted(patterns.items()):
+            yield f"  Pattern: {pattern}"
             if isinstance(fields, dict):
-                # New format with file sources
-                field_list = list(fields.keys())
-                lines.append(f"  Pattern: {pattern}")
-                for field in sorted(field_list):
-                    files = fields[field]
+                # New format with file sources, already in field order from analyze_field_variations
+                for field, files in fields.items():
                     files_str = ", ".join(files[:3])
                     if len(files) > 3:
                         files_str += f" and {len(files) - 3} more"
-                    lines.append(f"    - {field} (in {len(files)} files: {files_str})")
-            else:
-                # Old format without file sources
-                lines.append(f"  Pattern: {pattern}")
-                for field in sorted(fields):
-                    lines.append(f"    - {field}")
+                    yield f"    - {field} (in {len(files)} files: {files_str})"
+            elif fields:
+                # Old format without file sources, as one pre-joined chunk
+                yield "    - " + "\n    - ".join(sorted(fields))
+        
+        yield ""
+
+
+def format_field_variations(field_variations: Dict[str, Dict[str, Dict[str, List[str]]]], header_stats: Dict[str, Dict[str, Any]] = None) -> str:
+    """
+    Format field variations for display.
+    
+    Args:
+        field_variations: Dictionary mapping field types to dictionaries of patterns and matching fields,
+            as returned by analyze_field_variations (fields with sources are listed in their given order)
+        header_stats: Optional dictionary containing header statistics
         
-        lines.append("")
+    Returns:
+        Formatted string representation of field variations
+    """
+    return "\n".join(iter_field_variations(field_variations, header_stats))
+
+def iter_analysis_report(
+    total_files: int,
+    total_headers: int,
+    analyzed_files: List[str] = None,
+    datetime_str: str = None,
+    processing_time: float = None
+) -> Iterator[str]:
+    """
+    Yield the lines of the ultimate parser analysis report (with useful extra info).
     
-    return "\n".join(lines)
+    Lines are produced one at a time so a long file list can be written out
+    without first being joined into a single string.
+    """
+    yield "Ultimate Parser Analysis Report"
+    yield "=" * 80
+    if datetime_str:
+        yield f"Analysis run at: {datetime_str}"
+    if processing_time:
+        yield f"Processing time: {processing_time:.2f} seconds"
+    yield ""
+    yield f"Total files analyzed: {total_files}"
+    yield f"Total unique headers found: {total_headers}"
+    yield ""
+    if analyzed_files:
+        yield "Files analyzed:"
+        for analyzed_file in analyzed_files:
+            yield f"  - {analyzed_file}"
+        yield ""
 
 def format_analysis_report(
     total_files: int,
     total_headers: int,
-    analyzed_files: str = None,
+    analyzed_files: List[str] = None,
     datetime_str: str = None,
     processing_time: float = None
 ) -> str:
     """
     Unified formatting for ultimate parser analysis report (with useful extra info).
     """
-    lines = [
-        "Ultimate Parser Analysis Report",
-        "=" * 80,
-        f"Analysis run at: {datetime_str}" if datetime_str else None,
-        f"Processing time: {processing_time:.2f} seconds" if processing_time else None,
-        "",
-        f"Total files analyzed: {total_files}",
-        f"Total unique headers found: {total_headers}",
-        ""
-    ]
-    if analyzed_files:
-        lines.append("Files analyzed:")
-        lines.append(f"  - {analyzed_files}")
-        lines.append("")
-    # Remove None entries
-    lines = [l for l in lines if l is not None]
-    return "\n".join(lines)
+    return "\n".join(iter_analysis_report(total_files, total_headers, analyzed_files,
+                                          datetime_str, processing_time))
 
 def adjust_output_extension(output_path: str, output_format: str) -> str:
     """
@@ -2,6 +2,7 @@
 Field normalization and grouping logic.
 """
 import re
+from functools import lru_cache
 from typing import Any, Dict, List, Set, Tuple
 
 # Define field patterns for different types of fields
@@ -157,6 +158,20 @@ FIELD_PATTERNS = {
     ]
 }
 
+# FIELD_PATTERNS compiled once, in the same order, for the per-header matching below
+_COMPILED_FIELD_PATTERNS = {
+    field_type: [(pattern, re.compile(pattern, re.IGNORECASE)) for pattern in patterns]
+    for field_type, patterns in FIELD_PATTERNS.items()
+}
+
+# Separator and whitespace patterns used by normalize_field_name
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Maximum number of distinct field names whose normalized form is memoized
+NORMALIZE_CACHE_SIZE = 1 << 16
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_field_name(field_name: str) -> str:
     """
     Normalize a field name by converting to lowercase and removing non-alphanumeric characters.
@@ -171,9 +186,9 @@ def normalize_field_name(field_name: str) -> str:
         return ""
     # Convert to lowercase and replace common separators with spaces
     normalized = field_name.lower()
-    normalized = re.sub(r'[^a-z0-9]', ' ', normalized)
+    normalized = _NON_ALNUM_RE.sub(' ', normalized)
     # Replace multiple spaces with a single space
-    normalized = re.sub(r'\s+', ' ', normalized).strip()
+    normalized = _WHITESPACE_RE.sub(' ', normalized).strip()
     return normalized
 
 def get_field_type(field_name: str) -> str:
@@ -188,9 +203,9 @@ def get_field_type(field_name: str) -> str:
     """
     normalized = normalize_field_name(field_name)
     
-    for field_type, patterns in FIELD_PATTERNS.items():
-        for pattern in patterns:
-            if re.search(pattern, normalized, re.IGNORECASE):
+    for field_type, patterns in _COMPILED_FIELD_PATTERNS.items():
+        for _, regex in patterns:
+            if regex.search(normalized):
                 return field_type
     
     return 'other'
@@ -255,7 +270,8 @@ def analyze_field_variations(headers: List[str], header_stats: Dict[str, Dict[st
         header_stats: Optional dictionary containing header statistics with file sources
         
     Returns:
-        Dictionary mapping field types to dictionaries of patterns and matching fields with sources
+        Dictionary mapping field types to dictionaries of patterns and matching fields with sources;
+        the fields under each pattern are in sorted order
     """
     field_groups = group_fields(headers)
     result = {}
@@ -263,15 +279,19 @@ def analyze_field_variations(headers: List[str], header_stats: Dict[str, Dict[st
     for field_type, fields in field_groups.items():
         if field_type == 'other' or not fields:
             continue
+        
+        # Sort once so every per-pattern dict below is built in sorted order
+        fields = sorted(fields)
+        # Normalize each field once rather than once per pattern
+        normalized_fields = [(field, normalize_field_name(field)) for field in fields]
             
         pattern_matches = {}
         
         # For each pattern, find all fields that match it
-        for pattern in FIELD_PATTERNS[field_type]:
+        for pattern, regex in _COMPILED_FIELD_PATTERNS[field_type]:
             matched_fields = {}
-            for field in fields:
-                normalized = normalize_field_name(field)
-                if re.search(pattern, normalized, re.IGNORECASE):
+            for field, normalized in normalized_fields:
+                if regex.search(normalized):
                     if header_stats and field in header_stats:
                         matched_fields[field] = header_stats[field]['files']
                     else:
@@ -281,9 +301,7 @@ def analyze_field_variations(headers: List[str], header_stats: Dict[str, Dict[st
                 pattern_matches[pattern] = matched_fields
         
         # Add any unmatched fields to an 'other' category
-        matched_fields = set()
-        for fields_dict in pattern_matches.values():
-            matched_fields.update(fields_dict.keys())
+        matched_fields = set().union(*pattern_matches.values())
         
         if header_stats:
             unmatched_fields = {}
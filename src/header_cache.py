@@ -0,0 +1,129 @@
+"""
+On-disk cache of extracted headers, so unchanged files are not parsed again on every run.
+
+Entries are keyed by absolute path and tagged with the version of the
+extraction logic that produced them; entries of deleted files are dropped
+whenever the cache is rewritten.
+"""
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.header_extractors import HEADER_EXTRACTOR_VERSION
+
+# Default cache location
+HEADER_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "field_normalizer", "headers.json")
+
+
+def file_signature(file_path: str) -> Optional[Tuple[int, int]]:
+    """
+    Get the (modification time in ns, size) pair that identifies a file's current contents.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Tuple of (st_mtime_ns, st_size), or None if the file cannot be stat'ed
+    """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def load_header_cache(cache_path: str = HEADER_CACHE_PATH) -> Dict[str, Any]:
+    """
+    Load the header cache, starting empty if it is missing, unreadable or was
+    written by a different version of the header extraction logic.
+
+    Args:
+        cache_path: Path to the cache file
+
+    Returns:
+        Dictionary mapping absolute file paths to their cached entries
+    """
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != HEADER_EXTRACTOR_VERSION:
+        return {}
+    entries = data.get("entries")
+    return entries if isinstance(entries, dict) else {}
+
+
+def save_header_cache(cache: Dict[str, Any], cache_path: str = HEADER_CACHE_PATH) -> None:
+    """
+    Write the header cache, replacing the previous file atomically.
+
+    Args:
+        cache: Dictionary mapping absolute file paths to their cached entries
+        cache_path: Path to the cache file
+    """
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": HEADER_EXTRACTOR_VERSION, "entries": cache}, f, separators=(',', ':'))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: could not write header cache {cache_path}: {str(e)}", file=sys.stderr)
+
+
+def get_cached_headers(cache: Dict[str, Any], file_path: str,
+                       signature: Optional[Tuple[int, int]]) -> Optional[Tuple[List[str], bool]]:
+    """
+    Look up the headers of a file whose signature matches the cached one exactly.
+
+    Args:
+        cache: Header cache loaded with load_header_cache
+        file_path: Path to the file
+        signature: Current signature of the file from file_signature
+
+    Returns:
+        Tuple of (headers, headers_inferred), or None on a cache miss
+    """
+    if signature is None:
+        return None
+    entry = cache.get(os.path.abspath(file_path))
+    if not entry or entry.get("mtime_ns") != signature[0] or entry.get("size") != signature[1]:
+        return None
+    return entry["headers"], entry["headers_inferred"]
+
+
+def put_cached_headers(cache: Dict[str, Any], file_path: str, signature: Optional[Tuple[int, int]],
+                       headers: List[str], headers_inferred: bool) -> None:
+    """
+    Record the headers extracted from a file under its signature.
+
+    Args:
+        cache: Header cache loaded with load_header_cache
+        file_path: Path to the file
+        signature: Signature of the file taken before it was parsed
+        headers: Headers extracted from the file
+        headers_inferred: Whether the headers were inferred
+    """
+    if signature is None:
+        return
+    cache[os.path.abspath(file_path)] = {
+        "mtime_ns": signature[0],
+        "size": signature[1],
+        "headers": headers,
+        "headers_inferred": headers_inferred
+    }
+
+
+def prune_header_cache(cache: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Drop the entries of files that no longer exist.
+
+    Args:
+        cache: Header cache loaded with load_header_cache
+
+    Returns:
+        New cache holding the entries whose file is still present
+    """
+    return {path: entry for path, entry in cache.items() if os.path.exists(path)}
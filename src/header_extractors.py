@@ -9,6 +9,10 @@ import re
 from typing import List, Set, Tuple, Optional
 from .ai_header_inferrer import sample_csv_data, generate_headers_with_openrouter, update_csv_with_headers
 
+# Version of the extraction logic below; bump it whenever a change would
+# alter the headers extracted from an unchanged file, so the on-disk header
+# cache (src/header_cache.py) stops serving results from the old logic
+HEADER_EXTRACTOR_VERSION = 1
 
 def extract_headers_from_file(file_path: str) -> Tuple[List[str], bool]:
     """